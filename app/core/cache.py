@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""This module defines the Redis cache used by the API.
+
+The cache is an optimization only: when Redis cannot be reached, reads are
+treated as misses and writes are skipped, so the API keeps working off the
+database.
+"""
+
+from cachetools import TTLCache
+from fastapi import Request
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+# The rendered GET /doctors response, shared by every user.
+DOCTORS_KEY = "doctors"
+
+# The doctors response is also kept in each worker for a few seconds. Other
+# workers cannot invalidate that copy, so it is kept much shorter.
+local_doctors: TTLCache = TTLCache(
+    maxsize=1, ttl=settings.local_doctors_cache_ttl
+)
+
+
+def create_redis() -> Redis:
+    """Returns a new Redis client for the configured server.
+
+    The client's connections belong to the event loop that opens them, so
+    the application creates its client when it starts and closes it when it
+    shuts down (see `app.main.lifespan`). Connecting and every command time
+    out quickly and are not retried, so an unresponsive Redis is treated as
+    a cache miss instead of holding up the request.
+    """
+    return Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        socket_connect_timeout=settings.redis_socket_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        retry_on_timeout=False,
+    )
+
+
+def get_redis(request: Request) -> Redis:
+    """Returns the Redis client of the application serving the request."""
+    return request.app.state.redis
+
+
+def user_key(user_id) -> str:
+    """Returns the cache key of the user with the given ID."""
+    return f"user:{user_id}"
+
+
+def note_key(note_id) -> str:
+    """Returns the cache key of the note with the given ID."""
+    return f"note:{note_id}"
+
+
+async def get(key: str, *, redis: Redis) -> bytes | None:
+    """Returns the value cached under `key`, or None if it is not cached."""
+    try:
+        return await redis.get(key)
+    except RedisError:
+        return None
+
+
+async def set(key: str, value: str | bytes, *, ttl: int, redis: Redis) -> None:
+    """Caches `value` under `key` for `ttl` seconds."""
+    try:
+        await redis.set(key, value, ex=ttl)
+    except RedisError:
+        pass
+
+
+async def delete(*keys: str, redis: Redis) -> None:
+    """Removes `keys` from the cache."""
+    try:
+        await redis.delete(*keys)
+    except RedisError:
+        pass
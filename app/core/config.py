@@ -2,8 +2,9 @@
 
 """This module contains the configurations for the API."""
 import os
-from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
+from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -35,59 +36,124 @@ class Settings(BaseSettings):
     db_password: str = ""
     db_port: int = 0  # When using SQLite, this is not needed
     db_host: str = "localhost"
+    # Create missing tables on startup. Turn it off where the schema is
+    # managed separately to skip the table checks on every start.
+    db_create_tables: bool = True
+
+    # database connection pool (not used with SQLite)
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle: int = 1800  # seconds
+    # compiled SQL statements cached by the engine
+    db_query_cache_size: int = 1200
 
     # authentication and security
     secret_key: str
     access_token_expire_minutes: int = 60
-    access_token_duration: datetime = datetime.now(timezone.utc) + timedelta(
-        minutes=access_token_expire_minutes
-    )
 
     hashing_algorithm: str = "HS256"
+    # bcrypt work factor for new password hashes. Each step doubles the cost
+    # of a hash, raise it as the servers get faster.
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31)
+
+    # cache of verified access tokens
+    token_cache_size: int = 10_000
+    token_cache_ttl: int = 60  # seconds
+    # tokens issued at login are reused for the same user for a few seconds
+    issued_token_cache_ttl: int = 15  # seconds
     minimum_password_length: int = 8
     maximum_password_length: int = 15
 
     # LLM integration
-    llm_api_key: str = os.getenv("LLM_API_KEY") or os.getenv("GEMINI_API_KEY")
+    llm_api_key: str = Field(
+        validation_alias=AliasChoices("LLM_API_KEY", "GEMINI_API_KEY")
+    )
     llm_model: str = "gemini-2.5-flash"
 
     # Encryption settings. This is used to encrypt doctor notes
-    encryption_key: str = generate_encryption_key()
+    encryption_key: str = Field(default_factory=generate_encryption_key)
     encryption_algorithm: str = "AES"
 
     # Redis (for Caching & Background Jobs)
     redis_host: str = "localhost"
     redis_port: int = 6376
     redis_db: int = 0
+    # the cache is skipped rather than waited on when Redis is slow to answer
+    redis_socket_timeout: float = 0.25  # seconds
+    user_cache_ttl: int = 30  # seconds
+    # users are also kept in each worker, which cannot see other workers'
+    # invalidations: a user changed or deleted through one worker is still
+    # served as they were by the others for up to this long. 0 turns it off.
+    local_user_cache_ttl: int = 5  # seconds
+    note_cache_ttl: int = 60  # seconds
+    doctors_cache_ttl: int = 60  # seconds
+    local_doctors_cache_ttl: int = 5  # seconds
 
     # pagination
     pagination_limit: int = 100
     pagination_default_page: int = 10
 
-    model_config = SettingsConfigDict(env_file=".env")
+    model_config = SettingsConfigDict(
+        env_file=".env", env_ignore_empty=True, frozen=True
+    )
+
 
+def get_database_urls(settings: Settings) -> dict[str, str]:
+    """Returns the database URLs for the environment the API runs in.
 
-settings = Settings()
+    Args:
+        settings (Settings): The settings loaded from the environment.
+
+    Returns:
+        dict[str, str]: The resolved `db_url` and `db_test_url` values.
+    """
+    if settings.db_type == "sqlite":
+        db_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "..", "..")
+        )
+        if settings.app_env == "development":
+            return {
+                "db_url": f"sqlite:///{db_path}/{settings.db_name}_development.db",
+                "db_test_url": f"sqlite:///{db_path}/{settings.db_name}_test.db",
+            }
+
+        return {
+            "db_url": f"sqlite:///{db_path}/{settings.db_name}_production.db",
+            "db_test_url": settings.db_test_url,
+        }
 
-# Setup database for each environment
-if settings.db_type == "sqlite":
-    db_path = f"{os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))}"
     if settings.app_env == "development":
-        settings.db_url = f"sqlite:///{db_path}/{settings.db_name}_development.db"
-        settings.db_test_url = f"sqlite:///{db_path}/{settings.db_name}_test.db"
-    else:
-        settings.db_url = f"sqlite:///{db_path}/{settings.db_name}_production.db"
-elif settings.app_env == "development":
-    settings.db_url = settings.db_url or (
-        f"{settings.db_type}://{settings.db_user}:{settings.db_password}"
-        f"@{settings.db_host}:{settings.db_port}/{settings.db_name}_development"
-    )
-    settings.db_test_url = (
-        f"{settings.db_type}://{settings.db_user}_test:{settings.db_password}"
-        f"@{settings.db_host}:{settings.db_port}/{settings.db_name}_test"
-    )
-else:
-    settings.db_url = settings.db_url or (
-        f"{settings.db_type}://{settings.db_user}:{settings.db_password}"
-        f"@{settings.db_host}:{settings.db_port}/{settings.db_name}_production"
-    )
+        return {
+            "db_url": settings.db_url
+            or (
+                f"{settings.db_type}://{settings.db_user}:{settings.db_password}"
+                f"@{settings.db_host}:{settings.db_port}/{settings.db_name}_development"
+            ),
+            "db_test_url": (
+                f"{settings.db_type}://{settings.db_user}_test:{settings.db_password}"
+                f"@{settings.db_host}:{settings.db_port}/{settings.db_name}_test"
+            ),
+        }
+
+    return {
+        "db_url": settings.db_url
+        or (
+            f"{settings.db_type}://{settings.db_user}:{settings.db_password}"
+            f"@{settings.db_host}:{settings.db_port}/{settings.db_name}_production"
+        ),
+        "db_test_url": settings.db_test_url,
+    }
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the settings for the API.
+
+    The settings are loaded and validated once per process, every other call
+    reuses the cached instance.
+    """
+    settings = Settings()
+    return settings.model_copy(update=get_database_urls(settings))
+
+
+settings = get_settings()
@@ -2,42 +2,115 @@
 
 """This module defines the database connections."""
 
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql import func
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
 
+# The async drivers used for each of the supported database backends.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str) -> URL:
+    """Returns the database URL with the async driver for its backend."""
+    db_url = make_url(url)
+    backend = db_url.get_backend_name()
+
+    return db_url.set(drivername=ASYNC_DRIVERS.get(backend, db_url.drivername))
+
+
+# The compiled SQL of each query shape is cached by the engine, so a query
+# built per request is only compiled the first time.
 if settings.db_type == "sqlite":
-    engine = create_engine(
-        settings.db_url, connect_args={"check_same_thread": False}
+    engine = create_async_engine(
+        get_async_url(settings.db_url),
+        connect_args={"check_same_thread": False},
+        query_cache_size=settings.db_query_cache_size,
     )
 else:
-    engine = create_engine(settings.db_url)
+    engine = create_async_engine(
+        get_async_url(settings.db_url),
+        query_cache_size=settings.db_query_cache_size,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
 
 
-def get_session():
-    """Yields the database session."""
-    SQLModel.metadata.create_all(engine)
+async def create_db_and_tables():
+    """Creates the database tables that do not exist yet."""
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+
 
-    with Session(engine, expire_on_commit=False) as session:
+async def get_session():
+    """Yields the database session."""
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
 
 
-def save(model_instance, *, db: Session):
-    """Saves an instance of any object to the database."""
+async def save(model_instance, *, db: AsyncSession):
+    """Saves an instance of any object to the database.
+
+    The models fetch their server-generated values through RETURNING while
+    flushing (`eager_defaults`), so the object is not refreshed afterwards.
+    """
     db.add(model_instance)
-    db.commit()
-    db.refresh(model_instance)
+    await db.commit()
 
     return model_instance
 
 
-def delete(model_instance, *, db: Session):
+async def delete(model_instance, *, db: AsyncSession):
     """Delete an instance of an object from the database."""
-    db.delete(model_instance)
-    db.commit()
+    await db.delete(model_instance)
+    await db.commit()
 
 
-def count(model, *, db: Session) -> int:
+async def count(model, *, db: AsyncSession) -> int:
     """Returns the number of records for a specific model."""
-    return db.exec(select(func.count()).select_from(model)).one()
+    return await db.scalar(select(func.count()).select_from(model))
+
+
+async def load_relationships(
+    model_instance, *relationships: str, db: AsyncSession
+):
+    """Loads the given relationships of an object from the database.
+
+    Lazy loading is not available with async sessions, so relationships must
+    be loaded explicitly before they are accessed.
+    """
+    await db.refresh(model_instance, attribute_names=relationships)
+
+    return model_instance
+
+
+def eager_load(model, *relationships: str) -> list:
+    """Returns the loader options that load the given relationships of a model
+    together with it.
+
+    Nested relationships are given as dotted paths, e.g. "doctors.doctor".
+    """
+    options = []
+
+    for path in relationships:
+        related_model, loader = model, None
+        for name in path.split("."):
+            attribute = getattr(related_model, name)
+            loader = (
+                selectinload(attribute)
+                if loader is None
+                else loader.selectinload(attribute)
+            )
+            related_model = attribute.property.mapper.class_
+        options.append(loader)
+
+    return options
@@ -6,25 +6,34 @@ from typing import Annotated, Optional
 
 from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
-from fastapi.security.utils import get_authorization_scheme_param
+from redis.asyncio import Redis
 
+from app.core.cache import get_redis
 from app.core.config import settings
-from app.core.database import Session, get_session
+from app.core.database import AsyncSession, get_session
 from app.exceptions import UnauthorizedError
 
-DBSessionDependency = Annotated[Session, Depends(get_session)]
+DBSessionDependency = Annotated[AsyncSession, Depends(get_session)]
+RedisDependency = Annotated[Redis, Depends(get_redis)]
+
+BEARER_PREFIX = "bearer "
 
 
 class OAuth2PasswordBearer2(OAuth2PasswordBearer):
     async def __call__(self, request: Request) -> Optional[str]:
         authorization = request.headers.get("Authorization")
-        scheme, param = get_authorization_scheme_param(authorization)
-        if not authorization or scheme.lower() != "bearer":
+        # Runs on every authenticated request, so the scheme is checked by
+        # slicing rather than splitting the header.
+        if (
+            not authorization
+            or len(authorization) <= len(BEARER_PREFIX)
+            or authorization[: len(BEARER_PREFIX)].lower() != BEARER_PREFIX
+        ):
             if self.auto_error:
                 raise UnauthorizedError()
             else:
                 return None
-        return param
+        return authorization[len(BEARER_PREFIX) :]
 
 
 OAuth2SchemeDependency = Annotated[
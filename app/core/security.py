@@ -2,50 +2,135 @@
 
 """This module defines security functions."""
 
+import hashlib
+import json
+import os
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 import jwt
+from anyio import CapacityLimiter, to_thread
+from cachetools import TTLCache
+from jwt import PyJWK
 from jwt.exceptions import InvalidTokenError
+from jwt.utils import base64url_encode
 from passlib.context import CryptContext
 from pydantic import EmailStr
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import select
 
+from app.core import cache
 from app.core.config import settings
-from app.core.dependencies import DBSessionDependency, OAuth2SchemeDependency
+from app.core.database import eager_load
+from app.core.dependencies import (
+    DBSessionDependency,
+    OAuth2SchemeDependency,
+    RedisDependency,
+)
 from app.exceptions import UnauthorizedError
 from app.models.user import User
 from app.schemas.base import TokenPayload
+from app.schemas.user import User as UserSchema
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib compares bcrypt digests in constant time when verifying.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
+)
 
+# Password checks are CPU bound (bcrypt releases the GIL while hashing), so
+# running more of them at once than there are CPUs only adds contention. They
+# get their own limit so they never take up the threads shared with the rest
+# of the app.
+password_limiter = CapacityLimiter(os.cpu_count() or 1)
 
-def hash_password(*, password: str) -> str:
+# The secret key as a prepared JWK, so PyJWT does not have to validate and
+# prepare the secret again on every encode and decode.
+signing_key = PyJWK(
+    {
+        "kty": "oct",
+        "k": base64url_encode(settings.secret_key.encode()).decode(),
+    },
+    algorithm=settings.hashing_algorithm,
+)
+
+# Verified against when the user does not exist, so a login attempt costs the
+# same bcrypt work whether or not the email is registered.
+DUMMY_PASSWORD_HASH = pwd_context.hash("dummy-password")
+
+# Tokens that passed verification, keyed by a digest of the token. Each entry
+# holds the token payload and the expiry (epoch seconds) of the token itself.
+verified_tokens: TTLCache = TTLCache(
+    maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl
+)
+
+# Users recently resolved from a token, keyed by their cache key. This sits in
+# front of the Redis cache and is kept much shorter, as other workers cannot
+# invalidate it; see `Settings.local_user_cache_ttl`.
+local_users: TTLCache = TTLCache(
+    maxsize=settings.token_cache_size, ttl=settings.local_user_cache_ttl
+)
+
+# Tokens issued at login, keyed by their claims.
+issued_tokens: TTLCache = TTLCache(
+    maxsize=settings.token_cache_size, ttl=settings.issued_token_cache_ttl
+)
+
+
+async def hash_password(*, password: str) -> str:
     """Hashes the given password using the pwd_context.
 
+    Hashing is as slow as verifying, so it runs in a worker thread under the
+    same limit as the password checks.
+
     Args:
         password (str): The password to be hashed.
 
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    return await to_thread.run_sync(
+        pwd_context.hash, password, limiter=password_limiter
+    )
+
 
+async def is_valid_password(
+    *, plain_password: str, hashed_password: str
+) -> bool:
+    """Verify that the plain password matches the hashed_password in the DB.
 
-def is_valid_password(*, plain_password: str, hashed_password: str) -> bool:
-    """Verify that the plain password matches the hashed_password in the DB."""
-    return pwd_context.verify(plain_password, hashed_password)
+    Verifying a bcrypt hash is deliberately slow, so it runs in a worker
+    thread to keep the event loop free for other requests.
+    """
+    return await to_thread.run_sync(
+        pwd_context.verify,
+        plain_password,
+        hashed_password,
+        limiter=password_limiter,
+    )
 
 
-def authenticate_user(
+async def authenticate_user(
     db: DBSessionDependency, email: EmailStr, password: str
 ) -> User | None:
-    """Authenticate the user using their email and password."""
-    user: User | None = db.exec(select(User).where(User.email == email)).first()
+    """Authenticate the user using their email and password.
+
+    Unknown emails still go through a password check so their response time
+    does not reveal whether the email is registered.
+    """
+    user: User | None = (
+        await db.exec(select(User).where(User.email == email))
+    ).first()
 
     if not user:
+        await is_valid_password(
+            plain_password=password, hashed_password=DUMMY_PASSWORD_HASH
+        )
         return None
 
-    if not is_valid_password(
+    if not await is_valid_password(
         plain_password=password, hashed_password=user.password_hash
     ):
         return None
@@ -55,8 +140,13 @@ def authenticate_user(
 
 def create_access_token(
     data: dict, expires_delta: timedelta | None = None
-) -> str:
-    """Generate the access token for the user."""
+) -> dict:
+    """Generate the access token for the user.
+
+    Returns:
+        dict: The encoded token under `token` and its expiry under
+        `expires_at`.
+    """
     to_encode = data.copy()
 
     if expires_delta:
@@ -69,22 +159,47 @@ def create_access_token(
 
     encoded_jwt = jwt.encode(
         payload=to_encode,
-        key=settings.secret_key,
+        key=signing_key,
         algorithm=settings.hashing_algorithm,
     )
 
-    settings.access_token_duration = expire
-    return encoded_jwt
+    return {"token": encoded_jwt, "expires_at": expire}
+
+
+def get_access_token(data: dict) -> dict:
+    """Returns an access token for the given claims.
+
+    A token issued for the same claims within the last few seconds is
+    reused instead of signing a new one. It is still valid for nearly its
+    whole lifetime.
+    """
+    key = tuple(sorted(data.items()))
+
+    if (access_token := issued_tokens.get(key)) is None:
+        access_token = issued_tokens[key] = create_access_token(data)
+
+    return access_token
 
 
 async def verify_access_token(
     *,
     token: OAuth2SchemeDependency,
 ) -> TokenPayload:
-    """Verifies that the token being used is valid."""
+    """Verifies that the token being used is valid.
+
+    Verified tokens are cached for a short while (never past their expiry)
+    so repeated requests with the same token skip decoding it again.
+    """
+    token_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    if cached := verified_tokens.get(token_key):
+        token_data, expires_at = cached
+        if expires_at > time.time():
+            return token_data
+
     try:
         payload = jwt.decode(
-            token, settings.secret_key, algorithms=[settings.hashing_algorithm]
+            token, signing_key, algorithms=[settings.hashing_algorithm]
         )
         user_id = payload.get("sub")
         email = payload.get("email")
@@ -96,16 +211,74 @@ async def verify_access_token(
     except InvalidTokenError as error:
         raise UnauthorizedError() from error
 
+    if expires_at := payload.get("exp"):
+        verified_tokens[token_key] = (token_data, expires_at)
+
     return token_data
 
 
 async def get_current_user(
-    token: OAuth2SchemeDependency, db: DBSessionDependency
+    token: OAuth2SchemeDependency,
+    db: DBSessionDependency,
+    redis: RedisDependency,
 ) -> User:
-    """Returns the current authenticated user."""
+    """Returns the current authenticated user.
+
+    Users are cached in Redis for a few seconds, and for even less in the
+    process itself. Only the fields of the user schema are cached, never the
+    password hash. A cached user is attached to the session as if it had
+    been loaded from the database, so its relationships can still be loaded
+    afterwards.
+    """
     token_data = await verify_access_token(token=token)
+    cache_key = cache.user_key(token_data.user_id)
+
+    if (cached_user := local_users.get(cache_key)) is None:
+        if redis_user := await cache.get(cache_key, redis=redis):
+            cached_user = local_users[cache_key] = json.loads(redis_user)
 
-    if user := db.get(User, token_data.user_id):
+    if cached_user is not None:
+        user = User(**UserSchema.model_validate(cached_user).model_dump())
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+
+    if user := await db.get(User, token_data.user_id):
+        user_json = UserSchema.model_validate(user).model_dump_json()
+        local_users[cache_key] = json.loads(user_json)
+        await cache.set(
+            cache_key, user_json, ttl=settings.user_cache_ttl, redis=redis
+        )
         return user
     else:
         raise UnauthorizedError()
+
+
+@lru_cache
+def get_current_user_with(*relationships: str):
+    """Returns a dependency that resolves the current authenticated user with
+    the given relationships already loaded.
+
+    The user and its relationships are fetched up front, instead of loading
+    each relationship after the fact. Nested relationships are given as
+    dotted paths, e.g. "doctors.doctor".
+    """
+    options = eager_load(User, *relationships)
+
+    async def get_current_user_with_relationships(
+        token: OAuth2SchemeDependency, db: DBSessionDependency
+    ) -> User:
+        token_data = await verify_access_token(token=token)
+
+        if user := (
+            await db.exec(
+                select(User)
+                .where(User.id == token_data.user_id)
+                .options(*options)
+                .execution_options(populate_existing=True)
+            )
+        ).first():
+            return user
+        else:
+            raise UnauthorizedError()
+
+    return get_current_user_with_relationships
@@ -1,8 +1,9 @@
-from typing import Any, Dict, Generic, TypeVar
+from typing import Any, Dict, Generic, List, TypeVar
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlmodel import Session, SQLModel, select
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
 from app.exceptions import (
@@ -40,32 +41,53 @@ class APICrudBase(Generic[ModelType, SchemaType]):
         self.model = model
         self.model_name = model.__name__.lower()
 
+        # The error messages only depend on the model, so they are built once.
+        self._not_found_error = f"{self.model_name} not found"
+        self._fetch_error = f"Error fetching {self.model_name} objects"
+        self._update_forbidden_error = (
+            f"You are not authorized to update this {self.model_name}"
+        )
+        self._update_error = f"Error updating {self.model_name}"
+
     @staticmethod
     def get_detailed_error(error: Exception):
         """Returns a detailed error message.
 
+        The detail reported by PostgreSQL is read from the driver exception
+        (`diag` for psycopg, `detail` for asyncpg). For other drivers it is
+        parsed from the error message.
+
         Args:
             error: The exception object.
 
         Returns:
             The detailed error message.
         """
-        try:
-            detail_error = error.args[0].split("\n")[1]
-        except IndexError:
-            return "The data provided is not correct"
-
-        detail_error = detail_error.replace("DETAIL:  Key ", "")
+        driver_error = getattr(error, "orig", None)
+        detail_error = getattr(
+            getattr(driver_error, "diag", None), "message_detail", None
+        ) or getattr(getattr(driver_error, "__cause__", None), "detail", None)
+
+        if not detail_error:
+            try:
+                detail_error = error.args[0].split("\n")[1]
+            except IndexError:
+                return "The data provided is not correct"
+
+        detail_error = detail_error.replace("DETAIL:  ", "").replace("Key ", "", 1)
         detail_error = detail_error.replace("(", "").replace(")=", " ").replace(")", "")
         detail_error = detail_error.replace('"', "'")
         return detail_error
 
-    def get_by_id(self, *, db: Session, obj_id: UUID) -> ModelType:
+    async def get_by_id(
+        self, *, db: AsyncSession, obj_id: UUID, options: List | None = None
+    ) -> ModelType:
         """Returns a single object by its id.
 
         Args:
             db: The database session.
             obj_id: The id of the object.
+            options: Loader options for the relationships to load with it.
 
         Returns:
             The object with the specified id.
@@ -73,20 +95,27 @@ class APICrudBase(Generic[ModelType, SchemaType]):
         Raises:
             HTTPException: If the object is not found.
         """
-        if obj := db.get(self.model, obj_id):
+        # An object already in the session would be returned without running
+        # the loaders, so it is loaded again when options are given.
+        if obj := await db.get(
+            self.model, obj_id, options=options, populate_existing=bool(options)
+        ):
             return obj
 
-        raise NotFoundError(f"{self.model_name} not found")
+        raise NotFoundError(self._not_found_error)
 
-    def get_all(
+    async def get_all(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         skip: int = 0,
         limit: int = settings.pagination_default_page,
         order_by=None,
         join_model=None,
         filter_by: Dict | None = None,
+        where: List | None = None,
+        columns: List | None = None,
+        options: List | None = None,
     ):
         """Returns all objects of the model.
 
@@ -94,39 +123,54 @@ class APICrudBase(Generic[ModelType, SchemaType]):
             db: The database session.
             skip: The number of objects to skip.
             limit: The maximum number of objects to return.
-            order_by: The field to order the objects by.
+            order_by: The field, or list of fields, to order the objects by.
             filter_by: The field to filter records with
+            where: Extra conditions the objects must match.
             join_model: The model to join with.
+            columns: The columns to select instead of whole objects.
+            options: Loader options for the relationships to load with the
+                objects.
 
         Returns:
-            A list of all objects.
+            A list of all objects, or of rows holding only `columns` when
+            they are given.
 
         Raises:
             HTTPException: If there is an error fetching the objects.
         """
         try:
-            query = select(self.model)
+            query = select(*columns) if columns else select(self.model)
 
             if filter_by:
                 query = query.filter_by(**filter_by)
 
+            if where:
+                query = query.where(*where)
+
             if join_model:
                 query = query.join(join_model)
 
-            if order_by:
-                query = query.order_by(order_by)
+            if order_by is not None:
+                query = query.order_by(
+                    *(order_by if isinstance(order_by, list) else [order_by])
+                )
 
-            return db.exec(query.offset(skip).limit(limit)).all()
+            if options:
+                query = query.options(*options)
+
+            return (await db.exec(query.offset(skip).limit(limit))).all()
         except Exception as error:
             raise HTTPException(
                 detail={
-                    "message": f"Error fetching {self.model_name} objects",
+                    "message": self._fetch_error,
                     "reason": str(error).replace('"', "'"),
                 },
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
 
-    def create(self, db: Session, schema: SchemaType, **kwargs: Dict[str, Any]):
+    async def create(
+        self, db: AsyncSession, schema: SchemaType, **kwargs: Dict[str, Any]
+    ):
         """Creates a new object.
 
         Args:
@@ -140,8 +184,9 @@ class APICrudBase(Generic[ModelType, SchemaType]):
             Exception: If there is an error during creation.
         """
         try:
-            obj = self.model.model_validate(schema)
-            return self.model(**obj.model_dump()).save(db=db, created=True, **kwargs)
+            return await self.model.model_validate(schema).save(
+                db=db, created=True, **kwargs
+            )
         except Exception as e:
             error_name = e.__class__.__name__
 
@@ -151,13 +196,14 @@ class APICrudBase(Generic[ModelType, SchemaType]):
             if error_name == "IntegrityError":
                 raise UserExistsError()
 
-    def update(
+    async def update(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         schema: SchemaType,
         obj_id: str,
         obj_owner_id: str,
+        **kwargs: Dict[str, Any],
     ):
         """Updates an existing object.
 
@@ -166,6 +212,7 @@ class APICrudBase(Generic[ModelType, SchemaType]):
             schema: The schema object containing the updated data.
             obj_id: The id of the object to update.
             obj_owner_id: The id of the owner of the object.
+            kwargs: Extra arguments for the model's `save`.
 
         Returns:
             The updated object.
@@ -174,28 +221,28 @@ class APICrudBase(Generic[ModelType, SchemaType]):
             HTTPException: If the user is not authorized to update the object
             or if there is an error during update.
         """
-        db_obj = self.get_by_id(db=db, obj_id=obj_id)
+        db_obj = await self.get_by_id(db=db, obj_id=obj_id)
         if obj_owner_id != obj_id:
             raise ForbiddenActionError(
-                error=f"You are not authorized to update this {self.model_name}",
+                error=self._update_forbidden_error,
             )
         try:
-            return db_obj.sqlmodel_update(schema.model_dump(exclude_unset=True)).save(
-                db=db
-            )
+            return await db_obj.sqlmodel_update(
+                schema.model_dump(exclude_unset=True)
+            ).save(db=db, **kwargs)
         except Exception as error:
             raise HTTPException(
                 detail={
-                    "message": f"Error updating {self.model_name}",
+                    "message": self._update_error,
                     "reason": self.get_detailed_error(error),
                 },
                 status_code=status.HTTP_400_BAD_REQUEST,
             ) from error
 
-    def delete(
+    async def delete(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         obj_id: str,
         obj_owner_id: str,
     ):
@@ -209,8 +256,8 @@ class APICrudBase(Generic[ModelType, SchemaType]):
         Raises:
             HTTPException: If the user is not authorized to delete the object.
         """
-        obj = self.get_by_id(db=db, obj_id=obj_id)
+        obj = await self.get_by_id(db=db, obj_id=obj_id)
         if obj_owner_id != obj_id:
             raise ForbiddenActionError(error="You are forbidden to perform this action")
 
-        obj.delete(db=db)
+        await obj.delete(db=db)
@@ -1,8 +1,10 @@
 from typing import List, Set
 from uuid import UUID
 
-from sqlmodel import Session, select
+from sqlmodel import delete, insert, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.database import eager_load
 from app.crud.base import APICrudBase
 from app.exceptions import BadRequestError, NotFoundError
 from app.models.patient_doctor import PatientDoctor
@@ -18,19 +20,23 @@ class PatientDoctorCrud(APICrudBase[PatientDoctor, schemas.PatientDoctorBase]):
     doctor relationships. It inherits from APICrudBase.
     """
 
+    insert_batch_size: int = 1000
+
     def __init__(self, model: PatientDoctor = PatientDoctor):
         """Initialize the PatientDoctorCrud class."""
         super().__init__(model)
 
     @staticmethod
-    def get_by_patient_and_doctor(
-        *, patient_id: UUID, doctor_id: UUID, db: Session
+    async def get_by_patient_and_doctor(
+        *, patient_id: UUID, doctor_id: UUID, db: AsyncSession
     ) -> PatientDoctor:
         """Retrieve a specific patient-doctor relationship."""
-        if record := db.exec(
-            select(PatientDoctor)
-            .where(PatientDoctor.patient_id == patient_id)
-            .where(PatientDoctor.doctor_id == doctor_id)
+        if record := (
+            await db.exec(
+                select(PatientDoctor)
+                .where(PatientDoctor.patient_id == patient_id)
+                .where(PatientDoctor.doctor_id == doctor_id)
+            )
         ).first():
             return record
 
@@ -38,14 +44,16 @@ class PatientDoctorCrud(APICrudBase[PatientDoctor, schemas.PatientDoctorBase]):
             error=f"The doctor with ID {str(doctor_id)} is not assigned to you"
         )
 
-    def create(
-        self, *, db: Session, patient_id: UUID, doctor_ids: List[UUID]
+    async def create(
+        self, *, db: AsyncSession, patient_id: UUID, doctor_ids: List[UUID]
     ) -> List[PatientDoctor]:
         """Assign multiple doctors to a patient efficiently."""
         if not doctor_ids:
             raise BadRequestError(error="Doctor IDs list cannot be empty.")
 
-        existing_doctor_ids = self._get_existing_assignments(db, patient_id)
+        existing_doctor_ids = await self._get_existing_assignments(
+            db, patient_id, doctor_ids
+        )
         new_doctor_ids = set(doctor_ids) - existing_doctor_ids
 
         if not new_doctor_ids:
@@ -53,56 +61,79 @@ class PatientDoctorCrud(APICrudBase[PatientDoctor, schemas.PatientDoctorBase]):
                 error="All selected doctors are already assigned to this patient."
             )
 
-        valid_doctor_ids = self._validate_doctors(db, new_doctor_ids)
-        return self._insert_assignments(db, patient_id, valid_doctor_ids)
+        valid_doctor_ids = await self._validate_doctors(db, new_doctor_ids)
+        return await self._insert_assignments(db, patient_id, valid_doctor_ids)
 
-    def delete(self, *, patient_id: UUID, doctor_ids: List[UUID], db: Session) -> None:
+    async def delete(
+        self, *, patient_id: UUID, doctor_ids: List[UUID], db: AsyncSession
+    ) -> None:
         """Delete multiple patient-doctor relationships.
 
         Args:
             patient_id (UUID): The patient's ID.
             doctor_ids (List[UUID]): List of doctor IDs to remove.
-            db (Session): The database session.
+            db (AsyncSession): The database session.
 
         Raises:
-            BadRequestError: If some doctor IDs are not assigned, an error is raised.
+            BadRequestError: If the list of doctor IDs is empty.
+            NotFoundError: If any of the doctors is not assigned to the
+            patient. Nothing is deleted in that case.
         """
         if not doctor_ids:
             raise BadRequestError(error="Doctor IDs list cannot be empty.")
 
-        existing_records = [
-            self.get_by_patient_and_doctor(
-                patient_id=patient_id, doctor_id=doctor_id, db=db
-            )
-            for doctor_id in doctor_ids
-        ]
+        # The assignments are deleted in a single statement, which reports
+        # the ones it found. Anything missing rolls the deletion back.
+        deleted_doctor_ids = set(
+            (
+                await db.exec(
+                    delete(PatientDoctor)
+                    .where(
+                        PatientDoctor.patient_id == patient_id,
+                        PatientDoctor.doctor_id.in_(doctor_ids),
+                    )
+                    .returning(PatientDoctor.doctor_id)
+                )
+            ).scalars()
+        )
 
-        # Filter out None values (invalid relationships)
-        valid_records = [record for record in existing_records if record]
+        for doctor_id in doctor_ids:
+            if doctor_id not in deleted_doctor_ids:
+                await db.rollback()
+                raise NotFoundError(
+                    error=f"The doctor with ID {str(doctor_id)} is not assigned to you"
+                )
 
-        if valid_records:
-            for record in valid_records:
-                db.delete(record)
-            db.commit()
+        await db.commit()
 
-    def _get_existing_assignments(self, db: Session, patient_id: UUID) -> Set[UUID]:
-        """Fetch doctors already assigned to a patient."""
+    async def _get_existing_assignments(
+        self, db: AsyncSession, patient_id: UUID, doctor_ids: List[UUID]
+    ) -> Set[UUID]:
+        """Fetch which of the given doctors are already assigned to a
+        patient."""
         return set(
-            db.scalars(
-                select(PatientDoctor.doctor_id).where(
-                    PatientDoctor.patient_id == patient_id
+            (
+                await db.exec(
+                    select(PatientDoctor.doctor_id).where(
+                        PatientDoctor.patient_id == patient_id,
+                        PatientDoctor.doctor_id.in_(doctor_ids),
+                    )
                 )
             ).all()
         )
 
-    def _validate_doctors(self, db: Session, doctor_ids: Set[UUID]) -> Set[UUID]:
+    async def _validate_doctors(
+        self, db: AsyncSession, doctor_ids: Set[UUID]
+    ) -> Set[UUID]:
         """Ensure doctor IDs exist and belong to users with the role
         'doctor'."""
         valid_doctor_ids = set(
-            db.scalars(
-                select(User.id).where(
-                    User.id.in_(doctor_ids),
-                    User.role == UserRoleEnum.doctor,
+            (
+                await db.exec(
+                    select(User.id).where(
+                        User.id.in_(doctor_ids),
+                        User.role == UserRoleEnum.doctor,
+                    )
                 )
             ).all()
         )
@@ -116,17 +147,34 @@ class PatientDoctorCrud(APICrudBase[PatientDoctor, schemas.PatientDoctorBase]):
 
         return valid_doctor_ids
 
-    def _insert_assignments(
-        self, db: Session, patient_id: UUID, doctor_ids: Set[UUID]
+    async def _insert_assignments(
+        self, db: AsyncSession, patient_id: UUID, doctor_ids: Set[UUID]
     ) -> List[PatientDoctor]:
-        """Bulk insert new patient-doctor assignments."""
-        new_assignments = [
-            PatientDoctor(patient_id=patient_id, doctor_id=doc_id)
+        """Bulk insert new patient-doctor assignments.
+
+        The assignments are written with multi-row INSERTs of at most
+        `insert_batch_size` rows, whose RETURNING clauses hand back the
+        persisted rows with their doctors loaded. Batching keeps each
+        statement well under the bind parameter limit of the database.
+        """
+        rows = [
+            {"patient_id": patient_id, "doctor_id": doc_id}
             for doc_id in doctor_ids
         ]
-
-        db.bulk_save_objects(new_assignments)
-        db.commit()
+        new_assignments = []
+
+        for start in range(0, len(rows), self.insert_batch_size):
+            new_assignments.extend(
+                (
+                    await db.exec(
+                        insert(PatientDoctor)
+                        .values(rows[start : start + self.insert_batch_size])
+                        .returning(PatientDoctor)
+                        .options(*eager_load(PatientDoctor, "doctor"))
+                    )
+                ).scalars()
+            )
+        await db.commit()
 
         return new_assignments
 
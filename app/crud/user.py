@@ -1,5 +1,8 @@
-from sqlmodel import Session, select
+from redis.asyncio import Redis
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core import cache, security
 from app.crud.base import APICrudBase
 from app.exceptions import InternalServerError, NotFoundError
 from app.models.user import User
@@ -24,12 +27,12 @@ class UserCrud(APICrudBase[User, schemas.User]):
         super().__init__(model)
 
     @staticmethod
-    def get_by_email(*, email: str, db: Session) -> User:
+    async def get_by_email(*, email: str, db: AsyncSession) -> User:
         """Get a user by email.
 
         Args:
             email (str): The email of the user.
-            db (Session): The database session.
+            db (AsyncSession): The database session.
 
         Returns:
             User: The user with the specified email.
@@ -37,22 +40,26 @@ class UserCrud(APICrudBase[User, schemas.User]):
         Raises:
             self.not_found_error: If the user is not found.
         """
-        if user := db.exec(select(User).where(User.email == email)).first():
+        if user := (
+            await db.exec(select(User).where(User.email == email))
+        ).first():
             return user
 
         raise NotFoundError(error="User not found")
 
-    def create(
+    async def create(
         self,
         *,
-        db: Session,
+        db: AsyncSession,
         user: schemas.UserCreate,
+        redis: Redis,
     ) -> User:
         """Create a new user.
 
         Args:
-            db (Session): The database session.
+            db (AsyncSession): The database session.
             user (schemas.UserCreate): The user data to create.
+            redis (Redis): The Redis client holding the cached doctors.
 
         Returns:
             User: The created user.
@@ -60,15 +67,79 @@ class UserCrud(APICrudBase[User, schemas.User]):
         Raises:
             HTTPException: If the user already exists.
         """
-        return super().create(db=db, schema=user)
+        password_hash = await security.hash_password(password=user.password)
 
-    def __get_user(self, *, by: str, identifier: str, db: Session) -> User:
+        new_user = await super().create(
+            db=db,
+            schema=user.model_dump(exclude={"password"})
+            | {"password_hash": password_hash},
+        )
+        if user.role == schemas.UserRoleEnum.doctor:
+            cache.local_doctors.pop(cache.DOCTORS_KEY, None)
+            await cache.delete(cache.DOCTORS_KEY, redis=redis)
+
+        return new_user
+
+    async def update(
+        self,
+        *,
+        db: AsyncSession,
+        schema: schemas.User,
+        obj_id: str,
+        obj_owner_id: str,
+        redis: Redis,
+    ) -> User:
+        """Update a user and drop their cached copy.
+
+        Args:
+            db (AsyncSession): The database session.
+            schema (schemas.User): The updated user data.
+            obj_id (str): The ID of the user to update.
+            obj_owner_id (str): The ID of the user performing the update.
+            redis (Redis): The Redis client holding the cached user.
+
+        Returns:
+            User: The updated user.
+        """
+        user = await super().update(
+            db=db, schema=schema, obj_id=obj_id, obj_owner_id=obj_owner_id
+        )
+        await self._forget(obj_id, redis=redis)
+
+        return user
+
+    async def delete(
+        self, *, db: AsyncSession, obj_id: str, obj_owner_id: str, redis: Redis
+    ) -> None:
+        """Delete a user and drop their cached copy.
+
+        Args:
+            db (AsyncSession): The database session.
+            obj_id (str): The ID of the user to delete.
+            obj_owner_id (str): The ID of the user performing the deletion.
+            redis (Redis): The Redis client holding the cached user.
+        """
+        await super().delete(db=db, obj_id=obj_id, obj_owner_id=obj_owner_id)
+        await self._forget(obj_id, redis=redis)
+
+    @staticmethod
+    async def _forget(user_id, *, redis: Redis) -> None:
+        """Drops the cached copies of a user, and the cached list of doctors
+        they may appear in."""
+        cache_key = cache.user_key(user_id)
+        security.local_users.pop(cache_key, None)
+        cache.local_doctors.pop(cache.DOCTORS_KEY, None)
+        await cache.delete(cache_key, cache.DOCTORS_KEY, redis=redis)
+
+    async def __get_user(
+        self, *, by: str, identifier: str, db: AsyncSession
+    ) -> User:
         """Retrieves a user by their ID or username.
 
         Args:
             by (str): The type of data to use for the search.
             identifier (str): A unique value that identifiers a user.
-            db (Session): The database session instance.
+            db (AsyncSession): The database session instance.
 
         Raises:
             HTTPException: Error 404 is raised if the user does not exist.
@@ -79,9 +150,9 @@ class UserCrud(APICrudBase[User, schemas.User]):
         """
         match by:
             case "id":
-                return self.get_by_id(obj_id=identifier, db=db)
+                return await self.get_by_id(obj_id=identifier, db=db)
             case "email":
-                return self.get_by_email(email=identifier, db=db)
+                return await self.get_by_email(email=identifier, db=db)
             case _:
                 raise InternalServerError()
 
@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
-"""This module defines custom exceptions for the API."""
+"""This module defines custom exceptions for the API.
+
+The status codes, headers and the details of errors that take no arguments
+are constants, so they are defined once on the classes instead of being
+rebuilt every time an error is raised.
+"""
 
 from fastapi import HTTPException, status
 
@@ -9,39 +14,44 @@ class UserExistsError(HTTPException):
     """Raises an HTTP Error 409 (conflict) when email unique violation
     occur."""
 
+    status_code = status.HTTP_409_CONFLICT
+    headers = None
+    detail = {
+        "error": "Sorry, this email is already taken",
+        "success": False,
+        "status_code": status_code,
+    }
+
     def __init__(self):
-        self.status_code = status.HTTP_409_CONFLICT
-        self.detail = {
-            "error": "Sorry, this email is already taken",
-            "success": False,
-            "status_code": self.status_code,
-        }
+        pass
 
 
 class InternalServerError(HTTPException):
     """Raises an HTTP 500 (Internal Server Error)."""
 
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    headers = None
+    detail = {
+        "error": "Sorry, the server failed to respond correctly",
+        "next_steps": "Try again after some, if it "
+        "persists please contact the system admin",
+        "success": False,
+        "status_code": status_code,
+    }
+
     def __init__(self):
-        self.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-        self.detail = {
-            "error": "Sorry, the server failed to respond correctly",
-            "next_steps": "Try again after some, if it "
-            "persists please contact the system admin",
-            "success": False,
-            "status_code": self.status_code,
-        }
+        pass
 
 
 class ForbiddenActionError(HTTPException):
     """Raises an HTTP 403 (forbidden) error."""
 
-    def __init__(self, *, error: str = ""):
-        if error == "":
-            error = "You are not authorized to perform this action"
+    status_code = status.HTTP_403_FORBIDDEN
+    headers = None
 
-        self.status_code = status.HTTP_403_FORBIDDEN
+    def __init__(self, *, error: str = ""):
         self.detail = {
-            "error": error,
+            "error": error or "You are not authorized to perform this action",
             "success": False,
             "status_code": self.status_code,
         }
@@ -50,26 +60,27 @@ class ForbiddenActionError(HTTPException):
 class UnauthorizedError(HTTPException):
     """Raises an HTTP 401 (unauthorized) error."""
 
+    status_code = status.HTTP_401_UNAUTHORIZED
+    headers = {"WWW-Authenticate": "Bearer"}
+    detail = {
+        "error": "Invalid email or password",
+        "success": False,
+        "status_code": status_code,
+    }
+
     def __init__(self):
-        self.status_code = status.HTTP_401_UNAUTHORIZED
-        self.headers = {"WWW-Authenticate": "Bearer"}
-        self.detail = {
-            "error": "Invalid email or password",
-            "success": False,
-            "status_code": self.status_code,
-        }
+        pass
 
 
 class BadRequestError(HTTPException):
     """Raises HTTP 400 (Bad request) error."""
 
-    def __init__(self, error: str = ""):
-        if error == "":
-            error = "Invalid request"
+    status_code = status.HTTP_400_BAD_REQUEST
+    headers = None
 
-        self.status_code = status.HTTP_400_BAD_REQUEST
+    def __init__(self, error: str = ""):
         self.detail = {
-            "error": error,
+            "error": error or "Invalid request",
             "success": False,
             "status_code": self.status_code,
         }
@@ -78,13 +89,12 @@ class BadRequestError(HTTPException):
 class NotFoundError(HTTPException):
     """Raises HTTP 404 (Not Found) error."""
 
-    def __init__(self, error: str = ""):
-        if error == "":
-            error = "Invalid request"
+    status_code = status.HTTP_404_NOT_FOUND
+    headers = None
 
-        self.status_code = status.HTTP_404_NOT_FOUND
+    def __init__(self, error: str = ""):
         self.detail = {
-            "error": error,
+            "error": error or "Invalid request",
             "success": False,
             "status_code": self.status_code,
         }
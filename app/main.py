@@ -2,16 +2,37 @@
 
 """This module is the entry for the Hospital backend API."""
 
+from contextlib import asynccontextmanager
 from typing import Dict
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import configure_mappers
 
+from app.core import cache
+from app.core.config import settings
+from app.core.database import create_db_and_tables, engine
 from app.docs import docs
 from app.routers.auth import router as auth_router
 from app.routers.notes import router as notes_router
 from app.routers.patient_doctor import router as patient_doctor_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepares the database and the Redis client on startup and releases
+    their connections on shutdown."""
+    if settings.db_create_tables:
+        await create_db_and_tables()
+    app.state.redis = cache.create_redis()
+    yield
+    await app.state.redis.aclose()
+    await engine.dispose()
+
+
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     version="v1",
     description=docs,
     title="Hospital Backend System",
@@ -28,6 +49,10 @@ app.include_router(auth_router, prefix="/api/v1/auth")
 app.include_router(patient_doctor_router)
 app.include_router(notes_router)
 
+# All the models are imported by now; resolve their relationships here
+# instead of during the first request that touches them.
+configure_mappers()
+
 
 @app.get("/", tags=["API Info & Status"], summary="Shows a welcome message")
 async def root():
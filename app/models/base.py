@@ -2,40 +2,80 @@
 
 """This module defines the base model for all other models."""
 
+import os
+import threading
+import time
 import uuid
-from datetime import datetime, timezone
 
 from sqlalchemy.orm import declared_attr
+from sqlalchemy.sql import func
 from sqlmodel import Field
 
 from app.core import database as session
 from app.core.dependencies import DBSessionDependency
 from app.schemas.base import Timestamp
 
+# The time and random bits of the last UUID generated, see uuid7().
+_uuid7_state = {"unix_ms": 0, "rand": 0}
+_uuid7_lock = threading.Lock()
+
+
+def uuid7() -> uuid.UUID:
+    """Returns a time-ordered (version 7) UUID.
+
+    The first 48 bits hold the Unix time in milliseconds and the rest is
+    random. New keys therefore land at the end of the primary key index
+    instead of at random pages. UUIDs generated within the same millisecond
+    increment the random bits of the previous one, so they still sort in the
+    order they were created.
+    """
+    with _uuid7_lock:
+        unix_ms = time.time_ns() // 1_000_000
+
+        if unix_ms <= _uuid7_state["unix_ms"]:
+            unix_ms = _uuid7_state["unix_ms"]
+            rand = _uuid7_state["rand"] + 1
+        else:
+            rand = int.from_bytes(os.urandom(10), "big") >> 6  # 74 bits
+
+        _uuid7_state.update(unix_ms=unix_ms, rand=rand)
+
+    value = (
+        (unix_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76  # version
+        | (rand >> 62 & 0xFFF) << 64
+        | 0x2 << 62  # RFC 4122 variant
+        | rand & 0x3FFF_FFFF_FFFF_FFFF
+    )
+
+    return uuid.UUID(int=value)
+
 
 class BaseModel(Timestamp):
     __abstract__ = True
+    # Read server-generated columns back with RETURNING on INSERT and UPDATE.
+    __mapper_args__ = {"eager_defaults": True}
 
     @declared_attr
     def __tablename__(cls) -> str:
         return cls.__name__.lower() + "s"
 
-    id: uuid.UUID = Field(
-        default_factory=uuid.uuid4, primary_key=True, index=True
-    )
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
 
     @classmethod
-    def count(cls, db: DBSessionDependency) -> int:
+    async def count(cls, db: DBSessionDependency) -> int:
         """Counts the number of records in the table for this model."""
-        return session.count(cls, db=db)
+        return await session.count(cls, db=db)
 
-    def save(self, *, db: DBSessionDependency, created: bool = False, **kwargs):
+    async def save(
+        self, *, db: DBSessionDependency, created: bool = False, **kwargs
+    ):
         """Saves the current object to the database."""
-        self.updated_at = (
-            self.created_at if created else datetime.now(timezone.utc)
-        )
-        return session.save(self, db=db, **kwargs)
+        if not created:
+            # rendered as now() in the UPDATE and read back with RETURNING
+            self.updated_at = func.now()
+        return await session.save(self, db=db, **kwargs)
 
-    def delete(self, *, db: DBSessionDependency):
+    async def delete(self, *, db: DBSessionDependency):
         """Deletes the current object from the database."""
-        session.delete(self, db=db)
+        await session.delete(self, db=db)
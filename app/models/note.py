@@ -4,11 +4,15 @@
 
 from __future__ import annotations
 
+from functools import cached_property
 from typing import TYPE_CHECKING
 from uuid import UUID
 
+from redis.asyncio import Redis
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
+from app.core import cache
 from app.core.dependencies import DBSessionDependency
 from app.exceptions import BadRequestError
 from app.models.base import BaseModel
@@ -21,18 +25,36 @@ if TYPE_CHECKING:
 class Note(BaseModel, table=True):
     """Defines the Note model."""
 
-    doctor_id: UUID = Field(foreign_key="users.id", nullable=False, index=True)
-    patient_id: UUID = Field(foreign_key="users.id", nullable=False, index=True)
+    # Notes are listed per doctor or per patient in (created_at, id) order,
+    # so each listing is a single range scan of one of these indexes. They
+    # also cover the lookups by doctor_id or patient_id alone.
+    __table_args__ = (
+        Index("ix_notes_doctor_id_created_at", "doctor_id", "created_at", "id"),
+        Index(
+            "ix_notes_patient_id_created_at", "patient_id", "created_at", "id"
+        ),
+    )
+
+    doctor_id: UUID = Field(foreign_key="users.id", nullable=False)
+    patient_id: UUID = Field(foreign_key="users.id", nullable=False)
     encrypted_content: str = Field(nullable=False)
 
+    # Relationships must be loaded explicitly (see `eager_load`); accessing
+    # one that was not loaded raises instead of querying once per note.
     doctor: User = Relationship(
-        sa_relationship_kwargs={"foreign_keys": "Note.doctor_id"}
+        sa_relationship_kwargs={
+            "foreign_keys": "Note.doctor_id",
+            "lazy": "raise_on_sql",
+        }
     )
     patient: User = Relationship(
-        sa_relationship_kwargs={"foreign_keys": "Note.patient_id"}
+        sa_relationship_kwargs={
+            "foreign_keys": "Note.patient_id",
+            "lazy": "raise_on_sql",
+        }
     )
 
-    @property
+    @cached_property
     def content(self) -> str:
         """Return the decrypted version of the doctor's note.
 
@@ -41,15 +63,32 @@ class Note(BaseModel, table=True):
         patient requesting this information has some form of
         relationship to it. If it's a doctor, then they must be owner,
         if it's a patient, then it must be for them.
+
+        The content is only decrypted once per instance.
         """
         return encryption.decrypt(content=self.encrypted_content)
 
-    def save(
-        self, *, db: DBSessionDependency, created: bool = False, **kwargs
+    async def save(
+        self,
+        *,
+        db: DBSessionDependency,
+        created: bool = False,
+        redis: Redis | None = None,
+        **kwargs,
     ) -> User:
-        """Save the new note."""
+        """Save the new note.
+
+        `redis` is the client holding the cached note, which is dropped when
+        an existing note is saved; it is required unless `created` is set.
+        """
+        if not created and redis is None:
+            raise TypeError("redis is required to save an existing note")
+
         content = kwargs.get("content")
 
+        # the cached plaintext is stale once the content is re-encrypted
+        self.__dict__.pop("content", None)
+
         if not content and not self.encrypted_content:
             raise BadRequestError(error="content can't be empty")
 
@@ -63,4 +102,9 @@ class Note(BaseModel, table=True):
         elif not encryption.is_encrypted(self.encrypted_content):
             self.encrypted_content = encryption.encrypt(self.encrypted_content)
 
-        return super().save(db=db, created=created)
+        note = await super().save(db=db, created=created)
+
+        if not created:
+            await cache.delete(cache.note_key(self.id), redis=redis)
+
+        return note
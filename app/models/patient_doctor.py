@@ -3,9 +3,10 @@
 """This module defines the model for associating patients and doctors."""
 
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime
 
-from sqlmodel import Field, Relationship, SQLModel, UniqueConstraint
+from sqlalchemy.sql import exists, func
+from sqlmodel import Field, Relationship, SQLModel, UniqueConstraint, select
 
 from app.core import database as session
 from app.core.dependencies import DBSessionDependency
@@ -15,29 +16,51 @@ class PatientDoctor(SQLModel, table=True):
     """Defines the Patient - Doctor association model"""
 
     patient_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
-    doctor_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+    # The primary key covers lookups by patient; this index serves the
+    # reverse lookups of a doctor's patients.
+    doctor_id: uuid.UUID = Field(
+        foreign_key="users.id", primary_key=True, index=True
+    )
     assigned_at: datetime = Field(
-        default=datetime.now(timezone.utc),
-        sa_column_kwargs={"nullable": False},
+        default=None,
+        sa_column_kwargs={"server_default": func.now(), "nullable": False},
     )
 
     patient: "User" = Relationship(
         back_populates="patients",
-        sa_relationship_kwargs={"foreign_keys": "PatientDoctor.patient_id"},
+        sa_relationship_kwargs={
+            "foreign_keys": "PatientDoctor.patient_id",
+            "lazy": "raise_on_sql",
+        },
     )
     doctor: "User" = Relationship(
         back_populates="doctors",
-        sa_relationship_kwargs={"foreign_keys": "PatientDoctor.doctor_id"},
+        sa_relationship_kwargs={
+            "foreign_keys": "PatientDoctor.doctor_id",
+            "lazy": "raise_on_sql",
+        },
     )
 
+    # Read assigned_at back with RETURNING when inserting.
+    __mapper_args__ = {"eager_defaults": True}
+
     __table_args__ = (
         UniqueConstraint("patient_id", "doctor_id", name="uq_patient_doctor"),
     )
 
     @classmethod
-    def count(cls, db: DBSessionDependency) -> int:
+    async def count(cls, db: DBSessionDependency) -> int:
         """Counts the number of records in the table for this model."""
-        return session.count(cls, db=db)
+        return await session.count(cls, db=db)
+
+    @classmethod
+    async def exists_for(
+        cls, db: DBSessionDependency, patient_id: uuid.UUID
+    ) -> bool:
+        """Checks whether the patient has any doctor assigned."""
+        return await db.scalar(
+            select(exists().where(cls.patient_id == patient_id))
+        )
 
-    def save(self, db: DBSessionDependency):
-        return session.save(db=db, model_instance=self)
+    async def save(self, db: DBSessionDependency):
+        return await session.save(db=db, model_instance=self)
@@ -30,17 +30,20 @@ class User(BaseModel, table=True):
         sa_relationship_kwargs={"foreign_keys": "[PatientDoctor.doctor_id]"},
     )
 
+    # Loading every note of a user whenever the user is loaded (the current
+    # user, the doctor and patient of each listed note, ...) is never needed,
+    # so the note collections must be loaded explicitly.
     doctor_notes: Mapped[list["Note"]] = Relationship(
         back_populates="doctor",
         sa_relationship_kwargs={
             "foreign_keys": "Note.doctor_id",
-            "lazy": "selectin",
+            "lazy": "raise_on_sql",
         },
     )
     patient_notes: Mapped[list["Note"]] = Relationship(
         back_populates="patient",
         sa_relationship_kwargs={
             "foreign_keys": "Note.patient_id",
-            "lazy": "selectin",
+            "lazy": "raise_on_sql",
         },
     )
@@ -6,8 +6,48 @@ from typing import Annotated
 
 from fastapi import Depends
 
-from app.core.security import get_current_user
+from app.core.security import get_current_user, get_current_user_with
+from app.exceptions import ForbiddenActionError
 from app.models.user import User
 
+
+def require_role(role: str, current_user=get_current_user):
+    """Returns a dependency that resolves the current user (through the
+    `current_user` dependency) and rejects them unless they have `role`.
+
+    Args:
+        role (str): The role the user must have, "Doctor" or "Patient".
+        current_user: The dependency resolving the current user.
+    """
+    error = (
+        "You are unauthorized to perform this action. "
+        f"Only {role.lower()}s can perform this action."
+    )
+
+    async def get_user_with_role(
+        user: Annotated[User, Depends(current_user)],
+    ) -> User:
+        if user.role != role:
+            raise ForbiddenActionError(error=error)
+
+        return user
+
+    return get_user_with_role
+
+
 CurrentUserDependency = Annotated[User, Depends(get_current_user)]
 UserDependency: User = Depends(get_current_user)
+
+DoctorDependency = Annotated[User, Depends(require_role("Doctor"))]
+PatientDependency = Annotated[User, Depends(require_role("Patient"))]
+
+# The current doctor or patient with their assignments and the users on the
+# other side of each assignment already loaded.
+PatientWithDoctorsDependency = Annotated[
+    User,
+    Depends(require_role("Patient", get_current_user_with("doctors.doctor"))),
+]
+DoctorWithPatientsDependency = Annotated[
+    User,
+    Depends(require_role("Doctor", get_current_user_with("patients.patient"))),
+]
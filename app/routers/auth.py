@@ -5,15 +5,15 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.core import security
-from app.core.config import settings
-from app.core.dependencies import DBSessionDependency
+from app.core.dependencies import DBSessionDependency, RedisDependency
 from app.crud.user import crud_user
 from app.exceptions import UnauthorizedError
-from app.schemas.base import Token, TokenBase, UnauthorizedErrorResponse
-from app.schemas.user import User, UserCreate, UserResponse
+from app.schemas.base import Token, UnauthorizedErrorResponse
+from app.schemas.user import UserCreate, UserResponse
 
 router = APIRouter(tags=["Authentication"])
 
@@ -25,7 +25,9 @@ router = APIRouter(tags=["Authentication"])
     summary="Sign up: Create a New Doctor or Patient",
     operation_id="signup",
 )
-async def signup(user: UserCreate, db: DBSessionDependency):
+async def signup(
+    user: UserCreate, db: DBSessionDependency, redis: RedisDependency
+):
     """## Sign Up Endpoint
 
     ### Endpoint
@@ -99,11 +101,25 @@ async def signup(user: UserCreate, db: DBSessionDependency):
     ### Security
     - No authentication required to access this endpoint.
     """
-    new_user = crud_user.create(db=db, user=user)
-
-    return UserResponse(
-        message="User created successfully",
-        data=User(**new_user.model_dump()),
+    new_user = await crud_user.create(db=db, user=user, redis=redis)
+
+    # The user was just read back from the database, so the response is
+    # rendered directly instead of being copied into and validated against
+    # the `UserResponse` response model.
+    return ORJSONResponse(
+        {
+            "message": "User created successfully",
+            "status_code": status.HTTP_201_CREATED,
+            "success": True,
+            "data": {
+                "id": new_user.id,
+                "name": new_user.name,
+                "email": new_user.email,
+                "role": new_user.role,
+                "created_at": new_user.created_at,
+                "updated_at": new_user.updated_at,
+            },
+        },
         status_code=status.HTTP_201_CREATED,
     )
 
@@ -203,23 +219,28 @@ async def login(
     - No authentication required to access this endpoint.
     - Provides a JWT token upon successful login which can be used for authenticated requests.
     """
-    user = security.authenticate_user(
+    user = await security.authenticate_user(
         db=db, email=credentials.username, password=credentials.password
     )
 
     if user is None:
         raise UnauthorizedError()
 
-    access_token = security.create_access_token(
+    access_token = security.get_access_token(
         data={"sub": str(user.id), "email": user.email, "role": user.role}
     )
 
-    return Token(
-        message="Logged in successfully",
-        status_code=status.HTTP_200_OK,
-        data=TokenBase(
-            access_token=access_token,
-            token_type="bearer",
-            expires=settings.access_token_duration,
-        ),
+    # The token is generated here, so it is rendered directly instead of
+    # being validated against the `Token` response model again.
+    return ORJSONResponse(
+        {
+            "message": "Logged in successfully",
+            "status_code": status.HTTP_200_OK,
+            "success": True,
+            "data": {
+                "access_token": access_token["token"],
+                "token_type": "bearer",
+                "expires": access_token["expires_at"],
+            },
+        }
     )
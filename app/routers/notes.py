@@ -2,33 +2,120 @@
 
 """This module defines the endpoints used by doctors to add patient notes."""
 
+import hashlib
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Query, status
+import orjson
+from fastapi import APIRouter, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import tuple_
+from sqlalchemy.orm import aliased, joinedload
+from sqlmodel import select
 from starlette.status import HTTP_200_OK
 
-from app.core.dependencies import DBSessionDependency
+from app.core import cache
+from app.core.config import settings
+from app.core.database import load_relationships
+from app.core.dependencies import DBSessionDependency, RedisDependency
 from app.crud.base import APICrudBase
-from app.exceptions import BadRequestError, ForbiddenActionError
+from app.exceptions import ForbiddenActionError, NotFoundError
 from app.models.note import Note
-from app.routers import CurrentUserDependency
-from app.schemas import note as schema
+from app.models.patient_doctor import PatientDoctor
+from app.routers import CurrentUserDependency, DoctorDependency
 from app.schemas.note import (
     NoteCreate,
     NoteResponse,
     NotesFilterParams,
     NotesResponse,
 )
+from app.services import encryption
 
 router = APIRouter(prefix="/api/v1", tags=["Doctor & Patient Notes"])
 
 crud_note = APICrudBase(model=Note)
 
+# The relationships serialized in note responses. Each note has exactly one
+# doctor and one patient, so they are joined into the query for the notes.
+note_relationships = [joinedload(Note.doctor), joinedload(Note.patient)]
 
-def is_my_patient(patient_id: UUID, doctor: CurrentUserDependency):
-    """Verifies that a patient belongs to a doctor."""
-    return patient_id in [patient.patient_id for patient in doctor.patients]
+
+# The note column holding the user's own ID, and the one holding the other
+# party's, for each role.
+note_owner_column = {"Doctor": "doctor_id", "Patient": "patient_id"}
+note_peer_column = {"Doctor": "patient_id", "Patient": "doctor_id"}
+
+# Notes are listed oldest first. The ID breaks ties between notes created at
+# the same time.
+note_order = [Note.created_at, Note.id]
+
+
+def notes_after(cursor: UUID):
+    """Returns the condition matching the notes listed after the note with
+    the `cursor` ID.
+
+    The position of the cursor note is read in the same query, so a page
+    starts right after it without counting the rows before it (like OFFSET
+    does).
+    """
+    cursor_note = aliased(Note)
+
+    return tuple_(*note_order) > (
+        select(cursor_note.created_at, cursor_note.id)
+        .where(cursor_note.id == cursor)
+        .scalar_subquery()
+    )
+
+
+def serialize_note(note: Note) -> dict:
+    """Returns the response data of a note.
+
+    The notes come straight from the database, so they are rendered as they
+    are instead of being validated into the `Note` response schema first.
+    """
+    return {
+        "id": note.id,
+        "doctor": {"id": note.doctor.id, "name": note.doctor.name},
+        "patient": {"id": note.patient.id, "name": note.patient.name},
+        "content": note.content,
+        "created_at": note.created_at,
+    }
+
+
+def note_cache_entry(note: Note) -> dict:
+    """Returns the cached form of a note.
+
+    The content is cached encrypted, as it is stored in the database, and is
+    decrypted for each response. The owner IDs are kept next to the response
+    data to check who may read the note.
+    """
+    data = serialize_note(note)
+    del data["content"]
+
+    return {
+        "doctor_id": note.doctor_id,
+        "patient_id": note.patient_id,
+        "encrypted_content": note.encrypted_content,
+        "data": data,
+    }
+
+
+async def is_my_patient(
+    patient_id: UUID, doctor: CurrentUserDependency, db: DBSessionDependency
+):
+    """Verifies that a patient belongs to a doctor.
+
+    Only the assignment itself is looked up (by its primary key), instead of
+    loading every patient of the doctor.
+    """
+    return (
+        await db.exec(
+            select(PatientDoctor.patient_id).where(
+                PatientDoctor.patient_id == patient_id,
+                PatientDoctor.doctor_id == doctor.id,
+            )
+        )
+    ).first() is not None
 
 
 @router.post(
@@ -39,7 +126,7 @@ def is_my_patient(patient_id: UUID, doctor: CurrentUserDependency):
     operation_id="add_note",
 )
 async def add_note(
-    note: NoteCreate, db: DBSessionDependency, user: CurrentUserDependency
+    note: NoteCreate, db: DBSessionDependency, user: DoctorDependency
 ):
     """## Add Note
 
@@ -88,23 +175,14 @@ async def add_note(
       - **Example**:
         ```json
         {
-          "error": "You are unauthorized to perform this action"
+          "error": "You are unauthorized to perform this action. Only doctors can perform this action."
           "success": false,
           "status_code": 403
         }
         ```
 
-    - **400 Bad Request**
-      - **Content**: `application/json`
-      - **Schema**: `ErrorResponse`
-      - **Example**:
-        ```json
-        {
-          "error": "content cannot be empty"
-          "success": false,
-          "status_code": 400
-        }
-        ```
+    - **422 Unprocessable Entity**
+      - **Description**: Validation error, e.g. the content is empty.
 
     #### Security
     - Requires authentication.
@@ -113,23 +191,23 @@ async def add_note(
     #### Tags
     - Notes
     """
-    if user.role != "Doctor":
-        raise ForbiddenActionError(error="You are unauthorized to perform this action")
-
     # Ensure that doctors can write notes only for their patients
-    if not is_my_patient(patient_id=note.patient_id, doctor=user):
+    if not await is_my_patient(patient_id=note.patient_id, doctor=user, db=db):
         raise ForbiddenActionError(error="This is not a patient of yours")
 
-    if note.content == "":
-        raise BadRequestError(error="content cannot be empty")
+    # The content is encrypted into the note by `save`, only the IDs are set here.
+    db_note = Note(patient_id=note.patient_id, doctor_id=user.id)
+    await db_note.save(db=db, created=True, content=note.content)
+    await load_relationships(db_note, "doctor", "patient", db=db)
 
-    db_note = Note(**note.model_dump(), doctor_id=user.id)
-    db_note.save(db=db, created=True, content=note.content)
-
-    return NoteResponse(
-        message="Note retrieved successfully",
-        status_code=status.HTTP_200_OK,
-        data=schema.Note.model_validate(db_note),
+    return ORJSONResponse(
+        {
+            "message": "Note retrieved successfully",
+            "status_code": status.HTTP_200_OK,
+            "success": True,
+            "data": serialize_note(db_note),
+        },
+        status_code=status.HTTP_201_CREATED,
     )
 
 
@@ -140,7 +218,13 @@ async def add_note(
     status_code=HTTP_200_OK,
     operation_id="get_note",
 )
-def get_note(note_id: UUID, db: DBSessionDependency, user: CurrentUserDependency):
+async def get_note(
+    note_id: UUID,
+    request: Request,
+    db: DBSessionDependency,
+    redis: RedisDependency,
+    user: CurrentUserDependency,
+):
     """## Retrieve Note Details
 
     ### Endpoint
@@ -162,11 +246,19 @@ def get_note(note_id: UUID, db: DBSessionDependency, user: CurrentUserDependency
       - `message` (str): A message indicating the note was retrieved successfully.
       - `status_code` (int): The HTTP status code.
       - `data` (Note): The details of the note.
+    - **Headers**: `ETag` identifies this version of the note.
+
+    #### 304 Not Modified
+    - **Description**: The note has not changed since the client fetched it.
+      Returned without a body when the request's `If-None-Match` header
+      holds the note's current `ETag`.
 
-    #### 403 Forbidden
-    - **Description**: The user is not authorized to read this note.
-    - **Response Model**: `ForbiddenActionError`
-      - `error` (str): An error message indicating the user is not authorized.
+    #### 404 Not Found
+    - **Description**: The note does not exist or the user is not allowed
+      to read it. Both cases look the same, so the existence of other
+      users' notes is not revealed.
+    - **Response Model**: `NotFoundError`
+      - `error` (str): An error message indicating the note was not found.
 
     ### Request Example
     ```http
@@ -194,10 +286,10 @@ def get_note(note_id: UUID, db: DBSessionDependency, user: CurrentUserDependency
     }
     ```
 
-    #### 403 Forbidden
+    #### 404 Not Found
     ```json
     {
-      "error": "You are not authorized to read this note"
+      "error": "Note not found"
     }
     ```
 
@@ -207,18 +299,58 @@ def get_note(note_id: UUID, db: DBSessionDependency, user: CurrentUserDependency
       - Doctors can only access notes they created.
       - Patients can only access notes associated with their ID.
     """
-    note = crud_note.get_by_id(db=db, obj_id=note_id)
-
-    # Ensure the correct user can access the note
-    if (user.role == "Doctor" and note.doctor_id != user.id) or (
-        user.role == "Patient" and note.patient_id != user.id
-    ):
-        raise ForbiddenActionError(error="You are not authorized to read this note")
-
-    return NoteResponse(
-        message="Note retrieved successfully",
-        status_code=status.HTTP_200_OK,
-        data=schema.Note.model_validate(note),
+    # Only the notes the user wrote (doctors) or received (patients) match.
+    owner_column = note_owner_column[user.role]
+    cache_key = cache.note_key(note_id)
+
+    if cached_note := await cache.get(cache_key, redis=redis):
+        entry = orjson.loads(cached_note)
+        if entry[owner_column] != str(user.id):
+            raise NotFoundError(error="Note not found")
+    else:
+        owner_id = getattr(Note, owner_column)
+        note = (
+            await db.exec(
+                select(Note)
+                .where(Note.id == note_id, owner_id == user.id)
+                .options(*note_relationships)
+                .execution_options(populate_existing=True)
+            )
+        ).first()
+
+        if note is None:
+            raise NotFoundError(error="Note not found")
+
+        entry = note_cache_entry(note)
+        cached_note = orjson.dumps(entry)
+        await cache.set(
+            cache_key, cached_note, ttl=settings.note_cache_ttl, redis=redis
+        )
+
+    # The cache entry holds everything the response is made of (the content
+    # still encrypted), so it also tells whether the client's copy is current.
+    # An unchanged note is answered before its content is decrypted.
+    digest = hashlib.blake2b(cached_note, digest_size=16).hexdigest()
+    headers = {"ETag": f'W/"{digest}"', "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+
+    note_data = entry["data"]
+    note_data["content"] = encryption.decrypt(
+        content=entry["encrypted_content"]
+    )
+
+    return ORJSONResponse(
+        {
+            "message": "Note retrieved successfully",
+            "status_code": status.HTTP_200_OK,
+            "success": True,
+            "data": note_data,
+        },
+        headers=headers,
     )
 
 
@@ -282,32 +414,34 @@ async def list_notes(
     #### Tags
     - Doctor Notes
     """
-    if user.role == "Doctor":
-        if filter_query.patient_id:
-            notes = crud_note.get_all(
-                db=db,
-                filter_by={
-                    "doctor_id": user.id,
-                    "patient_id": filter_query.patient_id,
-                },
-            )
-        else:
-            notes = crud_note.get_all(db=db, filter_by={"doctor_id": user.id})
-
-    else:
-        if filter_query.doctor_id:
-            notes = crud_note.get_all(
-                db=db,
-                filter_by={
-                    "patient_id": user.id,
-                    "doctor_id": filter_query.doctor_id,
-                },
-            )
-        else:
-            notes = crud_note.get_all(db=db, filter_by={"patient_id": user.id})
+    # Doctors may narrow their notes down to a patient, and patients to a
+    # doctor.
+    filter_by = {note_owner_column[user.role]: user.id}
+    peer_column = note_peer_column[user.role]
+    if peer_id := getattr(filter_query, peer_column):
+        filter_by[peer_column] = peer_id
+
+    # Pages after the first start right after the cursor note.
+    where = [notes_after(filter_query.cursor)] if filter_query.cursor else None
+
+    notes = await crud_note.get_all(
+        db=db,
+        filter_by=filter_by,
+        where=where,
+        order_by=note_order,
+        limit=filter_query.limit,
+        options=note_relationships,
+    )
 
-    return NotesResponse(
-        message="Notes retrieved successfully",
-        status_code=status.HTTP_200_OK,
-        data=[schema.Note.model_validate(note) for note in notes],
+    return ORJSONResponse(
+        {
+            "message": "Notes retrieved successfully",
+            "status_code": status.HTTP_200_OK,
+            "success": True,
+            "count": len(notes),
+            "next_cursor": (
+                notes[-1].id if len(notes) == filter_query.limit else None
+            ),
+            "data": [serialize_note(note) for note in notes],
+        }
     )
@@ -5,30 +5,42 @@
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, status
+import orjson
+from fastapi import APIRouter, Response, status
+from fastapi.responses import ORJSONResponse
 
+from app.core import cache
 from app.core.config import settings
-from app.core.dependencies import DBSessionDependency
+from app.core.dependencies import DBSessionDependency, RedisDependency
 from app.crud.patient_doctor import crud_patient_doctor
 from app.crud.user import crud_user
-from app.exceptions import ForbiddenActionError
 from app.models.patient_doctor import PatientDoctor as PatientDoctorModel
-from app.routers import CurrentUserDependency, UserDependency
+from app.models.user import User
+from app.routers import (
+    DoctorWithPatientsDependency,
+    PatientDependency,
+    PatientWithDoctorsDependency,
+    UserDependency,
+)
 from app.schemas.patient_doctor import (
-    DoctorPatient,
     DoctorPatientRead,
-    DoctorPatientReadBase,
-    DoctorRead,
     Doctors,
-    PatientDoctor,
     PatientDoctorCreate,
     PatientDoctorDelete,
     PatientDoctorRead,
-    PatientDoctorReadBase,
 )
 
 router = APIRouter(tags=["Patients & Doctors"], prefix=f"/api/{settings.api_version}")
 
+# The response of remove_assigned_doctors never changes, so it is rendered once.
+DOCTORS_UNASSIGNED_RESPONSE = orjson.dumps(
+    {
+        "message": "Doctors unassigned successfully",
+        "status_code": status.HTTP_200_OK,
+        "success": True,
+    }
+)
+
 
 @router.post(
     "/me/doctors",
@@ -41,7 +53,7 @@ router = APIRouter(tags=["Patients & Doctors"], prefix=f"/api/{settings.api_vers
 async def assign_doctors(
     patient_doctor: PatientDoctorCreate,
     db: DBSessionDependency,
-    user: CurrentUserDependency,
+    user: PatientDependency,
 ):
     """**This endpoint is accessible only by patients.**
 
@@ -49,13 +61,7 @@ async def assign_doctors(
     receive treatment from them. Multiple doctors can be assigned to a
     patient at a time, simply provide a list of the doctor IDs
     """
-    if user.role != "Patient":
-        raise ForbiddenActionError(
-            error="You are unauthorized to perform this action. "
-            "Only patients can perform this action."
-        )
-
-    doctors = crud_patient_doctor.create(
+    doctors = await crud_patient_doctor.create(
         db=db, doctor_ids=patient_doctor.doctor_ids, patient_id=user.id
     )
 
@@ -76,26 +82,14 @@ async def assign_doctors(
 async def remove_assigned_doctors(
     patient_doctor: PatientDoctorDelete,
     db: DBSessionDependency,
-    user: CurrentUserDependency,
+    user: PatientDependency,
 ):
     """Remove assigned doctors for the current authenticated user (patient)"""
-    if user.role != "Patient":
-        raise ForbiddenActionError(
-            error=(
-                "You are unauthorized to perform this action. "
-                "Only patients can perform this action."
-            )
-        )
-
-    crud_patient_doctor.delete(
+    await crud_patient_doctor.delete(
         patient_id=user.id, doctor_ids=patient_doctor.doctor_ids, db=db
     )
 
-    return {
-        "message": "Doctors unassigned successfully",
-        "status_code": status.HTTP_200_OK,
-        "success": True,
-    }
+    return Response(DOCTORS_UNASSIGNED_RESPONSE, media_type="application/json")
 
 
 @router.get(
@@ -106,19 +100,13 @@ async def remove_assigned_doctors(
     response_model=PatientDoctorRead,
     tags=["Patients"],
 )
-async def list_assigned_doctors(user: CurrentUserDependency):
+async def list_assigned_doctors(user: PatientWithDoctorsDependency):
     """Returns all the doctors this patient has selected."""
-    if user.role != "Patient":
-        raise ForbiddenActionError(
-            error=(
-                "You are unauthorized to perform this action. "
-                "Only patients can perform this action."
-            )
-        )
     return __build_patient_doctors_response(
         patient_id=user.id,
         doctors=user.doctors,
         message="Assigned Doctors retrieved successfully",
+        status_code=status.HTTP_200_OK,
     )
 
 
@@ -129,15 +117,7 @@ async def list_assigned_doctors(user: CurrentUserDependency):
     status_code=status.HTTP_200_OK,
     response_model=DoctorPatientRead,
 )
-async def list_patients(user: CurrentUserDependency):
-    if user.role != "Doctor":
-        raise ForbiddenActionError(
-            error=(
-                "You are unauthorized to perform this action. "
-                "Only doctors can perform this action."
-            )
-        )
-
+async def list_patients(user: DoctorWithPatientsDependency):
     return __build_doctor_patients_response(
         doctor_id=user.id,
         patients=user.patients,
@@ -152,34 +132,67 @@ async def list_patients(user: CurrentUserDependency):
     dependencies=[UserDependency],
     response_model=Doctors,
 )
-async def list_doctors(db: DBSessionDependency):
-    doctors = crud_user.get_all(db=db, filter_by={"role": "Doctor"})
+async def list_doctors(db: DBSessionDependency, redis: RedisDependency):
+    # The list is the same for every user, so the rendered response is cached
+    # until a doctor signs up, changes or leaves.
+    if content := cache.local_doctors.get(cache.DOCTORS_KEY):
+        return Response(content, media_type="application/json")
+
+    if not (content := await cache.get(cache.DOCTORS_KEY, redis=redis)):
+        doctors = await crud_user.get_all(
+            db=db, filter_by={"role": "Doctor"}, columns=[User.id, User.name]
+        )
+        content = orjson.dumps(
+            {
+                "message": "Doctors retrieved successfully",
+                "status_code": status.HTTP_200_OK,
+                "success": True,
+                "count": len(doctors),
+                "data": [
+                    {"id": doctor.id, "name": doctor.name} for doctor in doctors
+                ],
+            }
+        )
+        await cache.set(
+            cache.DOCTORS_KEY,
+            content,
+            ttl=settings.doctors_cache_ttl,
+            redis=redis,
+        )
 
-    return Doctors(
-        message="Doctors retrieved successfully",
-        status_code=status.HTTP_200_OK,
-        success=True,
-        data=[DoctorRead(id=doctor.id, name=doctor.name) for doctor in doctors],
-    )
+    cache.local_doctors[cache.DOCTORS_KEY] = content
+
+    return Response(content, media_type="application/json")
 
 
+# The assignments come straight from the database, so the responses below are
+# rendered as they are instead of being validated into their response models
+# (which are kept for the API docs).
 def __build_patient_doctors_response(
-    patient_id: UUID, doctors: List[PatientDoctorModel], message: str
-) -> PatientDoctorRead:
+    patient_id: UUID,
+    doctors: List[PatientDoctorModel],
+    message: str,
+    status_code=status.HTTP_201_CREATED,
+) -> ORJSONResponse:
     """Builds the response for patient-doctor records."""
-    return PatientDoctorRead(
-        message=message,
-        status_code=status.HTTP_201_CREATED,
-        data=PatientDoctorReadBase(
-            patient_id=patient_id,
-            doctors=[
-                PatientDoctor(
-                    doctor_name=doctor.doctor.name if doctor.doctor else "",
-                    **doctor.model_dump(),
-                )
-                for doctor in doctors
-            ],
-        ),
+    return ORJSONResponse(
+        {
+            "message": message,
+            "status_code": status_code,
+            "success": True,
+            "data": {
+                "patient_id": patient_id,
+                "doctors": [
+                    {
+                        "doctor_id": doctor.doctor_id,
+                        "doctor_name": doctor.doctor.name,
+                        "assigned_at": doctor.assigned_at,
+                    }
+                    for doctor in doctors
+                ],
+            },
+        },
+        status_code=status_code,
     )
 
 
@@ -188,22 +201,24 @@ def __build_doctor_patients_response(
     patients: List[PatientDoctorModel],
     message: str,
     status_code=status.HTTP_201_CREATED,
-) -> DoctorPatientRead:
+) -> ORJSONResponse:
     """Builds the response for patient-doctor records."""
-    patient_data = [
-        DoctorPatient(
-            patient_id=patient.patient_id,
-            assigned_at=patient.assigned_at,
-            patient_name=patient.patient.name,
-        )
-        for patient in patients
-    ]
-
-    return DoctorPatientRead(
-        message=message,
+    return ORJSONResponse(
+        {
+            "message": message,
+            "status_code": status_code,
+            "success": True,
+            "data": {
+                "doctor_id": doctor_id,
+                "patients": [
+                    {
+                        "patient_id": patient.patient_id,
+                        "patient_name": patient.patient.name,
+                        "assigned_at": patient.assigned_at,
+                    }
+                    for patient in patients
+                ],
+            },
+        },
         status_code=status_code,
-        data=DoctorPatientReadBase(
-            doctor_id=doctor_id,
-            patients=patient_data,
-        ),
     )
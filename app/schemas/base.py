@@ -2,11 +2,13 @@
 
 """This module defines base schemas."""
 
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Generic, TypeVar
+from uuid import UUID
 
 from fastapi import status
-from pydantic import UUID4, EmailStr, HttpUrl, model_validator
+from pydantic import EmailStr, HttpUrl
+from sqlalchemy.sql import func
 from sqlmodel import Field, SQLModel
 
 ResponseModel = TypeVar("ResponseModel")
@@ -17,37 +19,20 @@ class BaseResponse(SQLModel, Generic[ResponseModel]):
     status_code: int
     success: bool = True
     url: HttpUrl | None = Field(default=None, exclude=True)
-    count: int | None = Field(
-        default=None, description="The number of items.", exclude=True
-    )
     data: ResponseModel
 
-    @model_validator(mode="before")
-    @classmethod
-    def compute_count(cls, values):
-        """Computes the number of items in the data list.
-
-        Args:
-            values (dict): The values passed to the model.
-
-        Returns:
-            dict: The updated values with the correct count.
-        """
-        if "data" in values and isinstance(values["data"], list):
-            values["count"] = len(values["data"])
-
-        return values
-
 
 class Timestamp(SQLModel):
+    # Both timestamps are set by the database when a row is inserted.
     created_at: datetime = Field(
-        default=datetime.now(timezone.utc),
-        sa_column_kwargs={"nullable": False},
+        default=None,
+        sa_column_kwargs={"server_default": func.now(), "nullable": False},
     )
     updated_at: datetime = Field(
-        default=datetime.now(timezone.utc),
+        default=None,
         sa_column_kwargs={
-            "onupdate": datetime.now(timezone.utc),
+            "server_default": func.now(),
+            "onupdate": func.now(),
             "nullable": False,
         },
     )
@@ -72,7 +57,7 @@ class Token(BaseResponse[TokenBase]):
 class TokenPayload(SQLModel):
     """Represents the payload of a token."""
 
-    user_id: UUID4
+    user_id: UUID
     email: EmailStr
 
 
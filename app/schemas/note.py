@@ -6,15 +6,15 @@ from datetime import datetime
 from typing import List
 from uuid import UUID
 
-from pydantic import Field
+from pydantic import Field, computed_field
 from sqlmodel import SQLModel
 
-from app.models.note import Note
+from app.core.config import settings
 from app.schemas.base import BaseResponse
 
 
 class NoteCreate(SQLModel):
-    content: str = Field(description="The contents of the note")
+    content: str = Field(description="The contents of the note", min_length=1)
     patient_id: UUID = Field(description="The patient receiving the note")
 
 
@@ -38,17 +38,6 @@ class Note(SQLModel):
     content: str
     created_at: datetime
 
-    @classmethod
-    def model_validate(cls, note: Note):
-        """Converts DB model to response schema with decrypted content."""
-        return cls(
-            id=note.id,
-            doctor=note.doctor,
-            patient=note.patient,
-            content=note.content,
-            created_at=note.created_at,
-        )
-
 
 class NoteResponse(BaseResponse[Note]):
     data: Note
@@ -56,7 +45,18 @@ class NoteResponse(BaseResponse[Note]):
 
 class NotesResponse(BaseResponse[List[Note]]):
     data: List[Note]
-    count: int
+    next_cursor: UUID | None = Field(
+        default=None,
+        description=(
+            "Pass this as `cursor` to get the next page. It is null on the "
+            "last page."
+        ),
+    )
+
+    @computed_field(description="The number of items.")
+    @property
+    def count(self) -> int:
+        return len(self.data)
 
 
 class NotesFilterParams(SQLModel):
@@ -72,3 +72,16 @@ class NotesFilterParams(SQLModel):
             "The patient to filter by, used only when the user is a doctor."
         ),
     )
+    limit: int = Field(
+        default=settings.pagination_default_page,
+        ge=1,
+        le=settings.pagination_limit,
+        description="The maximum number of notes to return.",
+    )
+    cursor: UUID | None = Field(
+        default=None,
+        description=(
+            "The `next_cursor` of the previous page. Only the notes after it "
+            "are returned."
+        ),
+    )
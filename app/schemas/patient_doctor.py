@@ -6,6 +6,7 @@ from datetime import datetime
 from typing import List
 from uuid import UUID
 
+from pydantic import computed_field
 from sqlmodel import Field, SQLModel
 
 from app.schemas.base import BaseResponse
@@ -74,4 +75,8 @@ class Doctors(BaseResponse[List[DoctorRead]]):
     """Response schema for retrieving multiple doctors."""
 
     data: List[DoctorRead]
-    count: int
+
+    @computed_field(description="The number of items.")
+    @property
+    def count(self) -> int:
+        return len(self.data)
@@ -6,11 +6,10 @@ import uuid
 from datetime import datetime
 from enum import Enum
 
-from pydantic import EmailStr, Field, computed_field
+from pydantic import EmailStr, Field
 from sqlmodel import SQLModel
 
 from app.core.config import settings
-from app.core.security import hash_password
 from app.schemas.base import BaseResponse
 
 
@@ -56,11 +55,6 @@ class UserCreate(SQLModel):
         max_length=settings.maximum_password_length,
     )
 
-    @computed_field
-    @property
-    def password_hash(self) -> str:
-        return hash_password(password=self.password)
-
 
 class UserLogin(SQLModel):
     """Schema for user login."""
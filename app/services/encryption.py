@@ -3,11 +3,39 @@
 """This module defines the encryption and decryption functions for the doctors
 notes."""
 
-from cryptography.fernet import Fernet, InvalidToken
+import base64
+import binascii
+import os
+
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 from app.core.config import settings
 
+# Notes are encrypted with AES-256-GCM. Notes written before that are Fernet
+# tokens, which can still be decrypted.
 fernet = Fernet(settings.encryption_key)
+aesgcm = AESGCM(
+    HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None, info=b"notes:aes-gcm"
+    ).derive(base64.urlsafe_b64decode(settings.encryption_key))
+)
+
+# AES-GCM tokens are the prefix followed by the base64 encoded nonce and
+# ciphertext (which ends with the 16 bytes authentication tag).
+AESGCM_TOKEN_PREFIX = "aesgcm:"
+AESGCM_NONCE_SIZE = 12
+# The shortest token (empty content) holds 28 bytes.
+AESGCM_TOKEN_MIN_SIZE = 28
+
+# Every Fernet token starts with the base64 encoding of its version byte
+# (0x80) followed by the high bytes of its timestamp.
+FERNET_VERSION = 0x80
+FERNET_TOKEN_PREFIX = "gAAAAA"
+# The shortest token (one block of ciphertext) is 73 bytes.
+FERNET_TOKEN_MIN_SIZE = 73
 
 
 def decrypt(content: str) -> str:
@@ -19,7 +47,13 @@ def decrypt(content: str) -> str:
     Returns:
         str: The decrypted content.
     """
-    return fernet.decrypt(content.encode()).decode()
+    if not content.startswith(AESGCM_TOKEN_PREFIX):
+        return fernet.decrypt(content.encode()).decode()
+
+    token = base64.urlsafe_b64decode(content[len(AESGCM_TOKEN_PREFIX) :])
+    return aesgcm.decrypt(
+        token[:AESGCM_NONCE_SIZE], token[AESGCM_NONCE_SIZE:], None
+    ).decode()
 
 
 def encrypt(content: str) -> str:
@@ -34,13 +68,39 @@ def encrypt(content: str) -> str:
     Returns:
         str: The encrypted version of the content
     """
-    return fernet.encrypt(content.encode()).decode()
+    nonce = os.urandom(AESGCM_NONCE_SIZE)
+    token = nonce + aesgcm.encrypt(nonce, content.encode(), None)
 
+    return AESGCM_TOKEN_PREFIX + base64.urlsafe_b64encode(token).decode()
 
-def is_encrypted(content: str) -> bool:
-    """Check if the content is already encrypted."""
+
+def _b64decode(content: str) -> bytes:
+    """Decodes urlsafe base64 `content`, returns empty bytes if it is not.
+
+    Characters outside the alphabet are rejected instead of being skipped,
+    so plaintext that merely starts like a token is not taken for one.
+    """
     try:
-        decrypt(content)
-        return True
-    except InvalidToken:
-        return False
+        return base64.b64decode(content, altchars=b"-_", validate=True)
+    except binascii.Error:
+        return b""
+
+
+def is_encrypted(content: str) -> bool:
+    """Check if the content is already encrypted.
+
+    Only the framing of the token is checked (its prefix, base64 encoding
+    and size, plus the version byte of Fernet tokens), the content is not
+    decrypted.
+    """
+    if content.startswith(AESGCM_TOKEN_PREFIX):
+        token = _b64decode(content[len(AESGCM_TOKEN_PREFIX) :])
+        return len(token) >= AESGCM_TOKEN_MIN_SIZE
+
+    if content.startswith(FERNET_TOKEN_PREFIX):
+        token = _b64decode(content)
+        return (
+            len(token) >= FERNET_TOKEN_MIN_SIZE and token[0] == FERNET_VERSION
+        )
+
+    return False
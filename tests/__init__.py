@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+"""Helpers shared by the test modules."""
+
+
+def auth_headers(token: str) -> dict:
+    """Returns the headers authenticating a request with the bearer token."""
+    return {"Authorization": f"Bearer {token}"}
+
+
+class FakeRedis:
+    """An in-memory stand-in for the Redis client, covering the commands the
+    cache uses. Expiry times are accepted but ignored."""
+
+    def __init__(self):
+        self.store: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: str | bytes, ex: int | None = None):
+        self.store[key] = value.encode() if isinstance(value, str) else value
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.store.pop(key, None) is not None for key in keys)
@@ -1,69 +1,227 @@
+import asyncio
+import os
 import subprocess
+from functools import lru_cache
+
+# Passwords are hashed with the cheapest bcrypt cost in tests; the settings
+# are read when the app is imported, so this has to come first.
+os.environ["BCRYPT_ROUNDS"] = "4"
 
 import pytest
+import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy import create_engine
-from sqlmodel import Session, SQLModel
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateSchema
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core import cache, security
 from app.core.config import settings
-from app.core.database import get_session
-from app.crud.user import crud_user
+from app.core.database import get_async_url, get_session
 from app.main import app
+from app.models.patient_doctor import PatientDoctor
 from app.models.user import User
-from app.schemas.user import UserCreate, UserRoleEnum
+from app.schemas.user import UserRoleEnum
+from tests import FakeRedis, auth_headers
+
+# The pytest-xdist worker running the tests (gw0, gw1, ...), if any. Each
+# worker gets its own PostgreSQL schema; SQLite databases are in memory and
+# so already private to each worker.
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+
+
+@lru_cache(maxsize=1)
+def create_memory_engine() -> AsyncEngine:
+    """Returns the engine of the in-memory SQLite test database.
+
+    The database only lives as long as its connection, so the engine keeps
+    a single connection for the whole run and is itself created only once.
+    SQLite's driver starts and ends transactions on its own, which breaks
+    SAVEPOINTs, so the transactions are started explicitly.
+    """
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def do_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
+
+
+def create_test_engine() -> AsyncEngine:
+    """Returns an engine for the test database."""
+    if settings.db_type == "sqlite":
+        return create_memory_engine()
+
+    execution_options = {}
+    if XDIST_WORKER:
+        execution_options["schema_translate_map"] = {None: XDIST_WORKER}
+
+    return create_async_engine(
+        get_async_url(settings.db_test_url), execution_options=execution_options
+    )
+
+
+async def dispose_test_engine(engine: AsyncEngine):
+    """Closes the connections of a test engine.
+
+    The in-memory database would be lost with its connection, so it is
+    kept open.
+    """
+    if engine.dialect.name != "sqlite":
+        await engine.dispose()
+
+
+async def create_test_tables():
+    """Recreates the tables of the test database."""
+    engine = create_test_engine()
+
+    async with engine.begin() as connection:
+        if XDIST_WORKER and engine.dialect.name != "sqlite":
+            await connection.execute(CreateSchema(XDIST_WORKER, if_not_exists=True))
+
+        await connection.run_sync(SQLModel.metadata.drop_all)
+        await connection.run_sync(SQLModel.metadata.create_all)
+
+    await dispose_test_engine(engine)
 
 
 @pytest.fixture(scope="package", autouse=True)
 def setup_teardown_test_db():
-    """Performs setup and tear-down for the test database."""
+    """Performs setup and tear-down for the test database.
+
+    The workers of a parallel run share the PostgreSQL test database, so
+    it must be set up with ./setup_test_db.sh before running them.
+    """
     print("Setting up test database")
-    if settings.db_type != "sqlite":
+    if settings.db_type != "sqlite" and not XDIST_WORKER:
         subprocess.run(["./setup_test_db.sh"])
 
+    asyncio.run(create_test_tables())
+
     yield
 
     print("Tearing down test database")
-    if settings.db_type != "sqlite":
+    if settings.db_type != "sqlite" and not XDIST_WORKER:
         subprocess.run(["./teardown_test_db.sh"])
 
 
 @pytest.fixture
-def session():
-    """Sets up the session for the test database connection."""
-    engine = create_engine(settings.db_test_url)
+async def session():
+    """Sets up the session for the test database connection.
+
+    Each test runs inside a transaction that is rolled back afterwards, so
+    nothing it writes reaches the next test. The session joins it through a
+    SAVEPOINT, so the commits and rollbacks made by the application only
+    end that SAVEPOINT.
+    """
+    engine = create_test_engine()
+
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+
+        async with AsyncSession(
+            bind=connection,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        ) as session:
+            yield session
+
+        await transaction.rollback()
 
-    SQLModel.metadata.drop_all(bind=engine)
-    SQLModel.metadata.create_all(bind=engine)
+    await dispose_test_engine(engine)
 
-    with Session(engine, expire_on_commit=False) as session:
-        yield session
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    """Runs the tests on asyncio only, the event loop the API is served on."""
+    return "asyncio"
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def http_client():
+    """Yields the client shared by all the API tests.
+
+    One request is made before any test runs, so the app's one-off setup on
+    its first request is not timed as part of whichever test comes first.
+    """
+    async with AsyncClient(
+        base_url="http://api.test.com", transport=ASGITransport(app=app)
+    ) as client:
+        await client.get("/status")
+        yield client
 
 
 @pytest.fixture
-async def api_client(session: Session):
+def redis() -> FakeRedis:
+    """Fixture returning the Redis client the API uses during a test.
+
+    Each test starts with empty caches, in Redis and in the process.
+    """
+    security.local_users.clear()
+    cache.local_doctors.clear()
+    return FakeRedis()
+
+
+@pytest.fixture
+async def api_client(
+    http_client: AsyncClient, session: AsyncSession, redis: FakeRedis
+):
     """Yields a client object to be used for API testing."""
 
-    def override_get_session():
+    async def override_get_session():
         """A fixture to override the default database session used in tests.
 
         Explanation:
-        This fixture yields the provided session for testing purposes and
-        ensures that the session is properly closed after the test.
+        This fixture yields the provided session for testing purposes. The
+        session is only rolled back when a request fails and is otherwise
+        left open, so rows the test has only flushed stay visible to later
+        requests; the session fixture closes it when the test ends.
 
         Returns:
             The database session for testing.
         """
         try:
             yield session
-        finally:
-            session.close()
+        except Exception:
+            await session.rollback()
+            raise
 
     app.dependency_overrides[get_session] = override_get_session
-    yield AsyncClient(base_url="http://api.test.com", transport=ASGITransport(app=app))
+    app.dependency_overrides[cache.get_redis] = lambda: redis
+    yield http_client
+
+
+@pytest.fixture(scope="session")
+def password_hash() -> str:
+    """Fixture returning the hash of "password1234", the password of every
+    test user.
+
+    The password is hashed once for the whole run instead of once for each
+    user of each test.
+    """
+    return security.pwd_context.hash("password1234")
+
+
+async def create_user(session: AsyncSession, password_hash: str, **details) -> User:
+    """Creates a user with the given details and the hashed password."""
+    return await User(**details, password_hash=password_hash).save(
+        db=session, created=True
+    )
 
 
 @pytest.fixture
-def doc_jdoe(session: Session) -> User:
+async def doc_jdoe(session: AsyncSession, password_hash: str) -> User:
     """Fixture to create a doctor user.
 
     User Details:
@@ -71,22 +229,23 @@ def doc_jdoe(session: Session) -> User:
         password: password1234
 
     Args:
-        session (Session): The database session to use for creating the user.
+        session (AsyncSession): The database session to use for creating the user.
+        password_hash (str): The hash of the user's password.
 
     Returns:
         models.User: The created user object in the database.
     """
-    user = UserCreate(
+    return await create_user(
+        session,
+        password_hash,
         email="jdoe@email.com",
-        password="password1234",
         role=UserRoleEnum.doctor,
         name="John Doe",
     )
-    return crud_user.create(db=session, user=user)
 
 
 @pytest.fixture
-def patient_sally(session: Session) -> User:
+async def patient_sally(session: AsyncSession, password_hash: str) -> User:
     """Fixture to create a patient user.
 
     User Details:
@@ -94,27 +253,124 @@ def patient_sally(session: Session) -> User:
         password: password1234
 
     Args:
-        session (Session): The database session to use for creating the user.
+        session (AsyncSession): The database session to use for creating the user.
+        password_hash (str): The hash of the user's password.
 
     Returns:
         models.User: The created user object in the database.
     """
-    user = UserCreate(
+    return await create_user(
+        session,
+        password_hash,
         email="sally@email.com",
-        password="password1234",
         role=UserRoleEnum.patient,
         name="Sally Banks",
     )
-    return crud_user.create(db=session, user=user)
 
 
 @pytest.fixture
-def patient_bob(session: Session) -> User:
-    user = UserCreate(
+async def patient_bob(session: AsyncSession, password_hash: str) -> User:
+    return await create_user(
+        session,
+        password_hash,
         email="bob@email.com",
-        password="password1234",
         role=UserRoleEnum.patient,
         name="Bob Manny",
     )
 
-    return crud_user.create(db=session, user=user)
+
+@pytest.fixture
+async def sally_has_jdoe(
+    session: AsyncSession, patient_sally: User, doc_jdoe: User
+) -> PatientDoctor:
+    """Fixture assigning the doctor John Doe to the patient Sally.
+
+    The assignment is saved (committed) like one made through the API, so a
+    request that rolls back its own changes does not undo it.
+    """
+    return await PatientDoctor(
+        patient_id=patient_sally.id, doctor_id=doc_jdoe.id
+    ).save(db=session)
+
+
+def issue_token(user: User) -> str:
+    """Returns an access token for the user, the same as logging in would.
+
+    The token is signed directly so tests don't pay for a bcrypt password
+    check on every request they authenticate; the login endpoint itself is
+    tested in tests/routers/test_auth.py.
+    """
+    return security.get_access_token(
+        data={"sub": str(user.id), "email": user.email, "role": user.role}
+    )["token"]
+
+
+@pytest.fixture
+def doc_jdoe_token(doc_jdoe: User) -> str:
+    """Fixture returning an access token for the doctor John Doe."""
+    return issue_token(doc_jdoe)
+
+
+@pytest.fixture
+def patient_sally_token(patient_sally: User) -> str:
+    """Fixture returning an access token for the patient Sally Banks."""
+    return issue_token(patient_sally)
+
+
+@pytest.fixture
+def patient_bob_token(patient_bob: User) -> str:
+    """Fixture returning an access token for the patient Bob Manny."""
+    return issue_token(patient_bob)
+
+
+def authenticate(client: AsyncClient, token: str):
+    """Sends the token with every request of the client until the test ends.
+
+    The client is shared, so only one user can be authenticated this way in
+    a test; tests acting as several users pass auth_headers() per request.
+    """
+    client.headers.update(auth_headers(token))
+    yield client
+    del client.headers["Authorization"]
+
+
+@pytest.fixture
+def doc_jdoe_client(api_client: AsyncClient, doc_jdoe_token: str):
+    """Fixture yielding the API client authenticated as the doctor."""
+    yield from authenticate(api_client, doc_jdoe_token)
+
+
+@pytest.fixture
+def patient_sally_client(api_client: AsyncClient, patient_sally_token: str):
+    """Fixture yielding the API client authenticated as the patient Sally."""
+    yield from authenticate(api_client, patient_sally_token)
+
+
+@pytest.fixture
+def patient_bob_client(api_client: AsyncClient, patient_bob_token: str):
+    """Fixture yielding the API client authenticated as the patient Bob."""
+    yield from authenticate(api_client, patient_bob_token)
+
+
+@pytest.fixture
+def client_as(
+    request: pytest.FixtureRequest,
+    api_client: AsyncClient,
+    doc_jdoe: User,
+    patient_sally: User,
+):
+    """Fixture returning a function that gives the API client authenticated
+    as the named user ("doc_jdoe" or "patient_sally"), or unauthenticated for
+    None, for tests parametrized over users.
+
+    The client and the users are requested here because async fixtures
+    cannot be set up from inside the running test.
+    """
+
+    def get_client(actor: str | None) -> AsyncClient:
+        if actor is None:
+            return api_client
+
+        return request.getfixturevalue(f"{actor}_client")
+
+    return get_client
@@ -3,13 +3,18 @@
 """This module tests the authentication endpoints to ensure users can create
 account, login, and update their profile as needed."""
 
+import json
+
 import pytest
 from fastapi import status
 from httpx import AsyncClient, Response
 
+from app.core import cache, security
+from app.crud.user import crud_user
 from app.models.user import User
 from app.schemas.base import Token
-from app.schemas.user import UserResponse
+from app.schemas.user import User as UserSchema
+from app.schemas.user import UserResponse, UserRoleEnum
 
 
 @pytest.mark.anyio
@@ -39,7 +44,7 @@ class TestSignUpEndpoint:
         assert user_response.message == "User created successfully"
         assert user_response.data.name == "John Doe"
 
-        assert User.count(db=session) == 1
+        assert await User.count(db=session) == 1
 
     async def test_that_password_hash_is_not_returned_in_response(
         self, api_client: AsyncClient
@@ -85,7 +90,7 @@ class TestSignUpEndpoint:
 
         # the first time should pass without errors
         assert response.status_code == status.HTTP_201_CREATED
-        assert User.count(db=session) == 1
+        assert await User.count(db=session) == 1
 
         # the second time must fail
         response: Response = await api_client.post(
@@ -106,7 +111,7 @@ class TestSignUpEndpoint:
         assert error.get("status_code") == 409
 
         # ensure that the number of users is the same and didn't change
-        assert User.count(db=session) == 1
+        assert await User.count(db=session) == 1
 
     async def test_signup_with_invalid_role_type(self, api_client: AsyncClient):
         """Test that invalid roles are not allowed to create accounts."""
@@ -138,7 +143,7 @@ class TestSignUpEndpoint:
         )
 
         assert response.status_code == status.HTTP_201_CREATED
-        assert User.count(db=session) == 1
+        assert await User.count(db=session) == 1
 
         user = UserResponse(**response.json())
 
@@ -206,3 +211,68 @@ class TestLoginEndpoint:
 
         assert "www-authenticate" in response.headers.keys()
         assert response.headers.get("www-authenticate") == "Bearer"
+
+
+@pytest.mark.anyio
+class TestCurrentUserCache:
+    """Tests the caching of the user resolved from an access token."""
+
+    async def test_cached_user_has_no_password_hash(
+        self, patient_sally_client: AsyncClient, patient_sally: User, redis
+    ):
+        """Test that the password hash is not cached with the user, in Redis
+        or in the process."""
+        cache_key = cache.user_key(patient_sally.id)
+
+        response = await patient_sally_client.get("/api/v1/notes")
+        assert response.status_code == status.HTTP_200_OK
+
+        assert "password_hash" not in json.loads(redis.store[cache_key])
+        assert "password_hash" not in security.local_users[cache_key]
+
+        # the user is still resolved when it is read back from Redis
+        security.local_users.clear()
+        response = await patient_sally_client.get("/api/v1/notes")
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_updated_user_is_seen_by_the_next_request(
+        self, doc_jdoe_client: AsyncClient, doc_jdoe: User, session, redis
+    ):
+        """Test that a user changed after being cached is not served from the
+        cache afterwards."""
+        response = await doc_jdoe_client.get("/api/v1/notes")
+        assert response.status_code == status.HTTP_200_OK
+        assert cache.user_key(doc_jdoe.id) in security.local_users
+
+        await crud_user.update(
+            db=session,
+            schema=UserSchema.model_construct(role=UserRoleEnum.patient),
+            obj_id=doc_jdoe.id,
+            obj_owner_id=doc_jdoe.id,
+            redis=redis,
+        )
+
+        response = await doc_jdoe_client.post(
+            "/api/v1/notes",
+            json={"patient_id": str(doc_jdoe.id), "content": "Take rest"},
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "Only doctors" in response.json()["detail"]["error"]
+
+    async def test_deleted_user_is_no_longer_authenticated(
+        self, doc_jdoe_client: AsyncClient, doc_jdoe: User, session, redis
+    ):
+        """Test that a user deleted after being cached can no longer
+        authenticate."""
+        response = await doc_jdoe_client.get("/api/v1/notes")
+        assert response.status_code == status.HTTP_200_OK
+
+        await crud_user.delete(
+            db=session,
+            obj_id=doc_jdoe.id,
+            obj_owner_id=doc_jdoe.id,
+            redis=redis,
+        )
+
+        response = await doc_jdoe_client.get("/api/v1/notes")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -9,9 +9,14 @@ from httpx import AsyncClient, Response
 from app.models.note import Note
 from app.models.patient_doctor import PatientDoctor
 from app.models.user import User
-from app.schemas.base import Token
+from app.routers.notes import crud_note
 from app.schemas.note import NotesResponse, NoteResponse
 from app.services import encryption
+from tests import auth_headers
+
+# The contents of the notes used by the listing tests, encrypted only once.
+BOB_NOTE = encryption.encrypt("The user needs lots of rest")
+SALLY_NOTE = encryption.encrypt("The patient is suffering from tubercolosis")
 
 
 @pytest.mark.anyio
@@ -19,184 +24,186 @@ class TestCreationEndpoint:
     """Test the POST /api/v1/notes endpoint used by doctors to add patient
     notes."""
 
-    async def test_valid_creation_works(
+    # (user, whether the patient is assigned to the doctor, content, status)
+    CASES = [
+        pytest.param(
+            "doc_jdoe",
+            True,
+            "The patient needs long rests and sleep.",
+            status.HTTP_201_CREATED,
+            id="doctor_of_the_patient",
+        ),
+        pytest.param(
+            "patient_sally",
+            False,
+            "The patient needs long rests and sleep.",
+            status.HTTP_403_FORBIDDEN,
+            id="user_is_not_a_doctor",
+        ),
+        pytest.param(
+            "doc_jdoe",
+            False,
+            "The patient needs long rests and sleep.",
+            status.HTTP_403_FORBIDDEN,
+            id="patient_does_not_belong_to_doctor",
+        ),
+        pytest.param(
+            "doc_jdoe",
+            True,
+            "",
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            id="content_is_empty",
+        ),
+        pytest.param(
+            "doc_jdoe",
+            True,
+            "aesgcm: the patient asked about the aes gcm thing again today",
+            status.HTTP_201_CREATED,
+            id="content_starts_like_a_token",
+        ),
+    ]
+
+    @pytest.mark.parametrize(
+        "actor, relate_patient, content, expected_status", CASES
+    )
+    async def test_note_creation(
         self,
-        api_client: AsyncClient,
+        client_as,
         doc_jdoe: User,
         patient_sally: User,
         session,
+        actor: str,
+        relate_patient: bool,
+        content: str,
+        expected_status: int,
     ):
-        """Test that a doctor can create a note when logged in."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        # Add doctor-patient relationship to DB
-        patient_doctor_relation = PatientDoctor(
-            patient_id=patient_sally.id, doctor_id=doc_jdoe.id
-        )
-
-        session.add(patient_doctor_relation)
-        session.commit()  # Ensure it's persisted
-
-        # Send note creation request
-        response: Response = await api_client.post(
+        """Test that only a doctor of the patient can add a note with
+        content."""
+        if relate_patient:
+            session.add(
+                PatientDoctor(patient_id=patient_sally.id, doctor_id=doc_jdoe.id)
+            )
+            await session.flush()  # Make it visible to the request
+
+        response: Response = await client_as(actor).post(
             "/api/v1/notes",
-            json={
-                "content": "The patient needs long rests and sleep.",
-                "patient_id": str(patient_sally.id),
-            },
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        assert response.status_code == status.HTTP_201_CREATED
-
-    async def test_fails_when_user_is_not_a_doctor(
-        self, api_client: AsyncClient, patient_sally: User
-    ):
-        """Test that note creation fails when the user is not a doctor."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
+            json={"content": content, "patient_id": str(patient_sally.id)},
         )
 
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
+        assert response.status_code == expected_status
 
-        response: Response = await api_client.post(
-            "/api/v1/notes",
-            json={
-                "content": "The patient needs long rests and sleep.",
-                "patient_id": str(patient_sally.id),
-            },
-            headers={"Authorization": f"Bearer {token}"},
-        )
+        if expected_status == status.HTTP_422_UNPROCESSABLE_ENTITY:
+            assert response.json()["detail"][0]["loc"] == ["body", "content"]
 
-        assert response.status_code == status.HTTP_403_FORBIDDEN
 
-    async def test_fails_when_patient_does_not_belong_to_doctor(
-        self, api_client: AsyncClient, doc_jdoe: User, patient_sally: User
+@pytest.mark.anyio
+class TestSingleNoteFetchEndpoint:
+    async def test_can_fetch_existing_note(
+        self,
+        doc_jdoe_client: AsyncClient,
+        doc_jdoe: User,
+        patient_sally: User,
+        session,
     ):
-        """Test that note creation fails when the user is not a doctor."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
+        """Test that a doctor can fetch an existing note."""
+        # create a new note for the patient.
+        note = Note(
+            patient_id=patient_sally.id,
+            doctor_id=doc_jdoe.id,
+            encrypted_content="Patient needs medications to treat rashes",
         )
 
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        await note.save(db=session, created=True)
 
-        token = Token(**sign_in_response.json()).data.access_token
+        response: Response = await doc_jdoe_client.get(f"/api/v1/notes/{note.id}")
 
-        response: Response = await api_client.post(
-            "/api/v1/notes",
-            json={
-                "content": "The patient needs long rests and sleep.",
-                "patient_id": str(patient_sally.id),
-            },
-            headers={"Authorization": f"Bearer {token}"},
-        )
+        assert response.status_code == status.HTTP_200_OK
 
-        assert response.status_code == status.HTTP_403_FORBIDDEN
-        assert response
+        note_response: NoteResponse = NoteResponse(**response.json())
+        assert note_response.message == "Note retrieved successfully"
+        assert note_response.data.id == note.id
 
-    async def test_fails_if_content_is_empty(
+    async def test_can_fetch_note_encrypted_with_fernet(
         self,
-        api_client: AsyncClient,
+        doc_jdoe_client: AsyncClient,
         doc_jdoe: User,
         patient_sally: User,
         session,
     ):
-        """❌ Should fail if the note content is empty."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
-        )
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = sign_in_response.json()["data"]["access_token"]
-
-        # Assign doctor to patient
-        patient_doctor_relation = PatientDoctor(
-            patient_id=patient_sally.id, doctor_id=doc_jdoe.id
-        )
-        session.add(patient_doctor_relation)
-        session.commit()
-
-        response: Response = await api_client.post(
-            "/api/v1/notes",
-            json={
-                "content": "",  # Empty content
-                "patient_id": str(patient_sally.id),
-            },
-            headers={"Authorization": f"Bearer {token}"},
+        """Test that notes saved before the switch to AES-GCM can still be
+        read."""
+        note = Note(
+            patient_id=patient_sally.id,
+            doctor_id=doc_jdoe.id,
+            encrypted_content=encryption.fernet.encrypt(b"Take rest").decode(),
         )
+        await note.save(db=session, created=True)
 
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
-        assert response.json()["detail"]["error"] == "content cannot be empty"
+        response: Response = await doc_jdoe_client.get(f"/api/v1/notes/{note.id}")
 
+        assert response.status_code == status.HTTP_200_OK
+        assert NoteResponse(**response.json()).data.content == "Take rest"
 
-@pytest.mark.anyio
-class TestSingleNoteFetchEndpoint:
-    async def test_can_fetch_existing_note(
+    async def test_unchanged_note_is_not_sent_again(
         self,
-        api_client: AsyncClient,
+        doc_jdoe_client: AsyncClient,
         doc_jdoe: User,
         patient_sally: User,
         session,
+        redis,
     ):
-        """Test that a doctor can fetch an existing note."""
-        # create a new note for the patient.
+        """Test that a note is answered with 304 when the client's ETag is
+        still current."""
         note = Note(
             patient_id=patient_sally.id,
             doctor_id=doc_jdoe.id,
             encrypted_content="Patient needs medications to treat rashes",
         )
+        await note.save(db=session, created=True)
 
-        note.save(db=session, created=True)
-
-        # ensure the note was saved
-        assert Note.count(db=session) == 1
+        response: Response = await doc_jdoe_client.get(f"/api/v1/notes/{note.id}")
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["ETag"]
 
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
+        response = await doc_jdoe_client.get(
+            f"/api/v1/notes/{note.id}",
+            headers={"If-None-Match": etag},
         )
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
 
-        token = sign_in_response.json()["data"]["access_token"]
-        response: Response = await api_client.get(
+        await note.save(db=session, redis=redis, content="Rashes are gone")
+
+        response = await doc_jdoe_client.get(
             f"/api/v1/notes/{note.id}",
-            headers={"Authorization": f"Bearer {token}"},
+            headers={"If-None-Match": etag},
         )
-
         assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etag
 
-        note_response: NoteResponse = NoteResponse(**response.json())
-        assert note_response.message == "Note retrieved successfully"
-        assert note_response.data.id == note.id
-
-    async def test_throws_404_when_not_is_missing(
+    async def test_throws_404_when_note_belongs_to_someone_else(
         self,
-        api_client: AsyncClient,
+        patient_bob_client: AsyncClient,
         doc_jdoe: User,
+        patient_sally: User,
+        session,
     ):
-        """Test that error 404 is raised when the note doesn't exist."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
+        """Test that a note cannot be read by a patient it is not for."""
+        note = Note(
+            patient_id=patient_sally.id,
+            doctor_id=doc_jdoe.id,
+            encrypted_content="Patient needs medications to treat rashes",
         )
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        await note.save(db=session, created=True)
 
-        token = sign_in_response.json()["data"]["access_token"]
-        response: Response = await api_client.get(
-            "/api/v1/notes/726d12d1-3ef1-48d6-8045-d878a9c54cfc",
-            headers={"Authorization": f"Bearer {token}"},
+        response: Response = await patient_bob_client.get(f"/api/v1/notes/{note.id}")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_throws_404_when_not_is_missing(self, doc_jdoe_client: AsyncClient):
+        """Test that error 404 is raised when the note doesn't exist."""
+        response: Response = await doc_jdoe_client.get(
+            "/api/v1/notes/726d12d1-3ef1-48d6-8045-d878a9c54cfc"
         )
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -214,6 +221,8 @@ class TestNotesListingEndpoint:
     async def test_authenticated_patient_can_view_their_notes(
         self,
         api_client: AsyncClient,
+        patient_bob_token: str,
+        doc_jdoe_token: str,
         patient_bob: User,
         doc_jdoe: User,
         patient_sally: User,
@@ -221,48 +230,32 @@ class TestNotesListingEndpoint:
     ):
         """Tests that patients can see only their notes given by their
         doctor."""
-        # add doc_joe as the doctor for each of the users
-        PatientDoctor(patient_id=patient_bob.id, doctor_id=doc_jdoe.id).save(db=session)
-
-        PatientDoctor(patient_id=patient_sally.id, doctor_id=doc_jdoe.id).save(
-            db=session
+        # add doc_joe as the doctor for each of the users, and a note for each
+        session.add_all(
+            [
+                PatientDoctor(patient_id=patient_bob.id, doctor_id=doc_jdoe.id),
+                PatientDoctor(patient_id=patient_sally.id, doctor_id=doc_jdoe.id),
+                Note(
+                    doctor_id=doc_jdoe.id,
+                    patient_id=patient_bob.id,
+                    encrypted_content=BOB_NOTE,
+                ),
+                Note(
+                    doctor_id=doc_jdoe.id,
+                    patient_id=patient_sally.id,
+                    encrypted_content=SALLY_NOTE,
+                ),
+            ]
         )
-
-        assert PatientDoctor.count(db=session) == 2
-
-        # now create a note for each user
-        #
-        # note for patient Bob
-        Note(
-            doctor_id=doc_jdoe.id,
-            patient_id=patient_bob.id,
-            encrypted_content=encryption.encrypt("The user needs lots of rest"),
-        ).save(db=session, created=True)
-
-        # note for patient Sally
-        Note(
-            doctor_id=doc_jdoe.id,
-            patient_id=patient_sally.id,
-            encrypted_content=encryption.encrypt(
-                "The patient is suffering from tubercolosis"
-            ),
-        ).save(db=session, created=True)
-
-        assert Note.count(db=session) == 2
+        await session.flush()
 
         # Now as the doctor retrieve the notes
-        response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
-        )
-
-        assert response.status_code == status.HTTP_200_OK
-        token = response.json()["data"]["access_token"]
+        headers = auth_headers(doc_jdoe_token)
 
         # now retrieve the notes as the doctor (Doctor John Doe)
         response: Response = await api_client.get(
             "/api/v1/notes",
-            headers={"Authorization": f"Bearer {token}"},
+            headers=headers,
         )
 
         assert response.status_code == status.HTTP_200_OK
@@ -276,18 +269,12 @@ class TestNotesListingEndpoint:
         assert doctor_notes.data[1].patient.id == patient_sally.id
 
         # Now as patient Bob retrieve the notes, must be 1
-        response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": "bob@email.com", "password": "password1234"},
-        )
-
-        assert response.status_code == status.HTTP_200_OK
-        token = response.json()["data"]["access_token"]
+        headers = auth_headers(patient_bob_token)
 
         # now retrieve the notes as patient (Patient Bob Manny)
         response: Response = await api_client.get(
             "/api/v1/notes",
-            headers={"Authorization": f"Bearer {token}"},
+            headers=headers,
         )
 
         assert response.status_code == status.HTTP_200_OK
@@ -295,3 +282,87 @@ class TestNotesListingEndpoint:
 
         assert bob_notes.count == 1
         assert bob_notes.data[0].patient.id == patient_bob.id
+
+    async def test_notes_are_paginated_with_a_cursor(
+        self,
+        doc_jdoe_client: AsyncClient,
+        patient_bob: User,
+        doc_jdoe: User,
+        session,
+    ):
+        """Tests that each page starts right after the cursor it is given."""
+        await PatientDoctor(patient_id=patient_bob.id, doctor_id=doc_jdoe.id).save(
+            db=session
+        )
+
+        notes = []
+        for content in ("First visit", "Second visit", "Third visit"):
+            note = Note(
+                doctor_id=doc_jdoe.id,
+                patient_id=patient_bob.id,
+                encrypted_content=encryption.encrypt(content),
+            )
+            await note.save(db=session, created=True)
+            notes.append(note.id)
+
+        response = await doc_jdoe_client.get("/api/v1/notes", params={"limit": 2})
+        assert response.status_code == status.HTTP_200_OK
+        first_page = NotesResponse(**response.json())
+
+        assert [note.id for note in first_page.data] == notes[:2]
+        assert first_page.next_cursor == notes[1]
+
+        response = await doc_jdoe_client.get(
+            "/api/v1/notes", params={"limit": 2, "cursor": str(first_page.next_cursor)}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        last_page = NotesResponse(**response.json())
+
+        assert [note.id for note in last_page.data] == notes[2:]
+        assert last_page.next_cursor is None
+
+
+@pytest.mark.anyio
+class TestNoteUpdate:
+    """Tests updating existing notes, which drops their cached copy."""
+
+    async def test_note_without_a_cached_copy_is_updated(
+        self, doc_jdoe: User, patient_sally: User, session, redis
+    ):
+        """Test that a note that was never cached is updated."""
+        note = Note(
+            patient_id=patient_sally.id,
+            doctor_id=doc_jdoe.id,
+            encrypted_content="Patient needs medications to treat rashes",
+        )
+        await note.save(db=session, created=True)
+
+        updated_note = await crud_note.update(
+            db=session,
+            schema=Note.model_construct(encrypted_content="Rashes are gone"),
+            obj_id=note.id,
+            obj_owner_id=note.id,
+            redis=redis,
+        )
+
+        assert updated_note.content == "Rashes are gone"
+        assert encryption.is_encrypted(updated_note.encrypted_content)
+
+    async def test_note_is_not_updated_without_redis(
+        self, doc_jdoe: User, patient_sally: User, session
+    ):
+        """Test that saving an existing note without the Redis client fails
+        before anything is saved."""
+        note = Note(
+            patient_id=patient_sally.id,
+            doctor_id=doc_jdoe.id,
+            encrypted_content="Patient needs medications to treat rashes",
+        )
+        await note.save(db=session, created=True)
+        encrypted_content = note.encrypted_content
+
+        with pytest.raises(TypeError):
+            await note.save(db=session, content="Rashes are gone")
+
+        assert note.encrypted_content == encrypted_content
+        assert note not in session.dirty
@@ -12,92 +12,149 @@ import pytest
 from fastapi import status
 from httpx import AsyncClient, Response
 
+from app.core import cache
+from app.crud.user import crud_user
 from app.models.patient_doctor import PatientDoctor
 from app.models.user import User
-from app.schemas.base import Token
-from app.schemas.patient_doctor import DoctorPatientRead, PatientDoctorRead
+from app.schemas.patient_doctor import (
+    DoctorPatientRead,
+    Doctors,
+    PatientDoctorRead,
+)
+from app.schemas.user import User as UserSchema
+
+# IDs of doctors that do not exist, sent to the endpoints that take doctor IDs.
+DOCTOR_IDS = {
+    "doctor_ids": [
+        "bcb28c34-07a4-456c-953c-f8e80125a3c2",
+        "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
+    ]
+}
+
+ONLY_PATIENTS_ERROR = (
+    "You are unauthorized to perform this action. "
+    "Only patients can perform this action."
+)
+ONLY_DOCTORS_ERROR = (
+    "You are unauthorized to perform this action. Only doctors can perform this action."
+)
 
 
 @pytest.mark.anyio
-class TestPatientDoctorCreationEndpoint:
-    """Tests the POST /api/v1/me/doctors/ endpoint.
-
-    This endpoint allows the user (a patient) to select from the
-    available list of doctors.
-    """
-
-    async def test_create_with_unauthenticated_user(self, api_client: AsyncClient):
-        response: Response = await api_client.post(
+class TestAccessControl:
+    """Tests that the Patient-Doctor endpoints turn away anonymous users and
+    users of the wrong role."""
+
+    # (method, endpoint, user or None for no token, status, error)
+    CASES = [
+        pytest.param(
+            "post",
             "/api/v1/me/doctors",
-            json={
-                "doctor_ids": [
-                    "bcb28c34-07a4-456c-953c-f8e80125a3c2",
-                    "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
-                ]
-            },
-        )
-
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
-
-    async def test_doctor_selection_with_a_doctor(
-        self, api_client: AsyncClient, doc_jdoe: User
+            None,
+            status.HTTP_401_UNAUTHORIZED,
+            None,
+            id="assign_unauthenticated",
+        ),
+        pytest.param(
+            "post",
+            "/api/v1/me/doctors",
+            "doc_jdoe",
+            status.HTTP_403_FORBIDDEN,
+            ONLY_PATIENTS_ERROR,
+            id="assign_as_doctor",
+        ),
+        pytest.param(
+            "post",
+            "/api/v1/me/doctors/remove",
+            "doc_jdoe",
+            status.HTTP_403_FORBIDDEN,
+            ONLY_PATIENTS_ERROR,
+            id="remove_as_doctor",
+        ),
+        pytest.param(
+            "get",
+            "/api/v1/me/doctors",
+            None,
+            status.HTTP_401_UNAUTHORIZED,
+            None,
+            id="list_doctors_unauthenticated",
+        ),
+        pytest.param(
+            "get",
+            "/api/v1/me/doctors",
+            "doc_jdoe",
+            status.HTTP_403_FORBIDDEN,
+            ONLY_PATIENTS_ERROR,
+            id="list_doctors_as_doctor",
+        ),
+        pytest.param(
+            "get",
+            "/api/v1/me/patients",
+            None,
+            status.HTTP_401_UNAUTHORIZED,
+            None,
+            id="list_patients_unauthenticated",
+        ),
+        pytest.param(
+            "get",
+            "/api/v1/me/patients",
+            "patient_sally",
+            status.HTTP_403_FORBIDDEN,
+            ONLY_DOCTORS_ERROR,
+            id="list_patients_as_patient",
+        ),
+    ]
+
+    @pytest.mark.parametrize(
+        "method, endpoint, actor, expected_status, expected_error", CASES
+    )
+    async def test_access_is_denied(
+        self,
+        client_as,
+        method: str,
+        endpoint: str,
+        actor: str | None,
+        expected_status: int,
+        expected_error: str | None,
     ):
-        """Test that doctors are forbidden from selecting doctors."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
+        """Test that the endpoint is only served to the users it is for."""
+        kwargs = {"json": DOCTOR_IDS} if method == "post" else {}
+
+        response: Response = await getattr(client_as(actor), method)(
+            endpoint, **kwargs
         )
 
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        assert response.status_code == expected_status
 
-        token = Token(**sign_in_response.json()).data.access_token
+        if expected_error:
+            assert response.json()["detail"]["error"] == expected_error
 
-        response: Response = await api_client.post(
-            "/api/v1/me/doctors",
-            json={
-                "doctor_ids": [
-                    "bcb28c34-07a4-456c-953c-f8e80125a3c2",
-                    "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
-                ]
-            },
-            headers={"Authorization": f"Bearer {token}"},
-        )
 
-        expected_error_msg = (
-            "You are unauthorized to perform this action. "
-            "Only patients can perform this action."
-        )
+@pytest.mark.anyio
+class TestPatientDoctorCreationEndpoint:
+    """Tests the POST /api/v1/me/doctors/ endpoint.
 
-        assert response.status_code == status.HTTP_403_FORBIDDEN
-        assert response.json().get("detail").get("error") == expected_error_msg
+    This endpoint allows the user (a patient) to select from the
+    available list of doctors.
+    """
 
     async def test_doctor_assignment_with_patient_user(
         self,
-        api_client: AsyncClient,
+        patient_sally_client: AsyncClient,
         patient_sally: User,
         doc_jdoe: User,
         session,
     ):
         """Test that the doctor assignment works for the patient."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        response: Response = await api_client.post(
+        response: Response = await patient_sally_client.post(
             "/api/v1/me/doctors",
             json={"doctor_ids": [str(doc_jdoe.id)]},
-            headers={"Authorization": f"Bearer {token}"},
         )
 
         assert response.status_code == status.HTTP_201_CREATED
 
-        # Verify that exactly one instance was created
-        assert PatientDoctor.count(db=session) == 1
+        # Verify that the assignment was saved
+        assert await PatientDoctor.exists_for(session, patient_sally.id)
 
         data = PatientDoctorRead(**response.json()).data
         doctors = data.doctors
@@ -107,97 +164,33 @@ class TestPatientDoctorCreationEndpoint:
 
         # Verify that the Doctor ID assigned is the same the patient requested
         assert doctors[0].doctor_id == doc_jdoe.id
+        assert doctors[0].doctor_name == doc_jdoe.name
 
     async def test_doctor_assignment_with_empty_doctor_ids(
         self,
-        api_client: AsyncClient,
+        patient_sally_client: AsyncClient,
         patient_sally: User,
         session,
     ):
         """Test that the doctor assignment without any IDs in the array
         fails."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        response: Response = await api_client.post(
+        response: Response = await patient_sally_client.post(
             "/api/v1/me/doctors",
             json={"doctor_ids": []},
-            headers={"Authorization": f"Bearer {token}"},
         )
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
         # Verify that the instance was NOT created
-        assert PatientDoctor.count(db=session) == 0
-
-    async def test_doctor_unassignment_with_a_doctor(
-        self, api_client: AsyncClient, doc_jdoe: User
-    ):
-        """Test that doctors are forbidden from accessing the POST
-        /api/v1/me/doctors/remove endpoint.
-
-        This ensures that only patients can assign and remove their
-        doctors.
-        """
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        response: Response = await api_client.post(
-            "/api/v1/me/doctors/remove",
-            json={
-                "doctor_ids": [
-                    "bcb28c34-07a4-456c-953c-f8e80125a3c2",
-                    "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
-                ]
-            },
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        expected_error_msg = (
-            "You are unauthorized to perform this action. "
-            "Only patients can perform this action."
-        )
-
-        assert response.status_code == status.HTTP_403_FORBIDDEN
-        assert response.json().get("detail").get("error") == expected_error_msg
+        assert not await PatientDoctor.exists_for(session, patient_sally.id)
 
     async def test_doctor_selection_with_non_existent_doctor_ids(
-        self, api_client: AsyncClient, patient_sally: User
+        self, patient_sally_client: AsyncClient
     ):
         """Test that non-existent doctor IDs fail."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={
-                "username": patient_sally.email,
-                "password": "password1234",
-            },
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        response: Response = await api_client.post(
+        response: Response = await patient_sally_client.post(
             "/api/v1/me/doctors",
-            json={
-                "doctor_ids": [
-                    "bcb28c34-07a4-456c-953c-f8e80125a3c2",
-                    "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
-                ]
-            },
-            headers={"Authorization": f"Bearer {token}"},
+            json=DOCTOR_IDS,
         )
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -212,97 +205,60 @@ class TestPatientDoctorDeletionEndpoint:
     be removed, an error is thrown when anything goes wrong.
     """
 
-    async def test_deletion_with_doctor_user_fails(
-        self, api_client: AsyncClient, doc_jdoe: User
-    ):
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        response: Response = await api_client.get(
-            "/api/v1/me/doctors",
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        expected_error_msg = (
-            "You are unauthorized to perform this action. "
-            "Only patients can perform this action."
-        )
-
-        assert response.status_code == status.HTTP_403_FORBIDDEN
-        assert response.json().get("detail").get("error") == expected_error_msg
-
     async def test_delete_non_existent_assigment(
-        self, api_client: AsyncClient, patient_sally: User
+        self, patient_sally_client: AsyncClient
     ):
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        response: Response = await api_client.post(
+        response: Response = await patient_sally_client.post(
             "/api/v1/me/doctors/remove",
-            json={
-                "doctor_ids": [
-                    "bcb28c34-07a4-456c-953c-f8e80125a3c2",
-                    "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
-                ]
-            },
-            headers={"Authorization": f"Bearer {token}"},
+            json=DOCTOR_IDS,
         )
 
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
     async def test_delete_valid_assigned_doctor(
         self,
-        api_client: AsyncClient,
-        patient_sally: User,
+        patient_sally_client: AsyncClient,
         doc_jdoe: User,
+        sally_has_jdoe: PatientDoctor,
         session,
     ):
         """Test that patients can remove doctors they assigned to
         themselves."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        # assign doctor to patient
-        response: Response = await api_client.post(
-            "/api/v1/me/doctors",
-            json={"doctor_ids": [str(doc_jdoe.id)]},
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        assert response.status_code == status.HTTP_201_CREATED
-
-        # Verify that exactly one instance was created
-        assert PatientDoctor.count(db=session) == 1
-
-        response: Response = await api_client.post(
+        response: Response = await patient_sally_client.post(
             "/api/v1/me/doctors/remove",
             json={"doctor_ids": [str(doc_jdoe.id)]},
-            headers={"Authorization": f"Bearer {token}"},
         )
 
         assert response.status_code == status.HTTP_200_OK
         assert response.json().get("message") == "Doctors unassigned successfully"
 
         # Verify that the association instance was deleted
-        assert PatientDoctor.count(db=session) == 0
+        assert not await PatientDoctor.exists_for(session, sally_has_jdoe.patient_id)
+
+    async def test_nothing_is_deleted_when_a_doctor_is_not_assigned(
+        self,
+        patient_sally_client: AsyncClient,
+        doc_jdoe: User,
+        sally_has_jdoe: PatientDoctor,
+        session,
+    ):
+        """Test that no assignment is removed when one of the doctors is not
+        assigned to the patient."""
+        # the failed request rolls the session back, which expires its objects
+        patient_id = sally_has_jdoe.patient_id
+
+        response: Response = await patient_sally_client.post(
+            "/api/v1/me/doctors/remove",
+            json={
+                "doctor_ids": [
+                    str(doc_jdoe.id),
+                    "d2521f3c-87be-48d4-8a94-9d0af53df4ee",
+                ]
+            },
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert await PatientDoctor.exists_for(session, patient_id)
 
 
 @pytest.mark.anyio
@@ -310,36 +266,15 @@ class TestAssignedDoctorsListingEndpoint:
     """Tests the GET /api/v1/me/doctors to ensure doctors are retrieved when
     requested."""
 
-    async def test_with_unauthenticated_user(self, api_client: AsyncClient):
-        """Test that unauthenticated users are not granted access."""
-        response: Response = await api_client.get("/api/v1/me/doctors")
-
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
-
     async def test_with_existing_doctor_assignment(
-        self, api_client: AsyncClient, patient_sally: User, doc_jdoe: User
+        self,
+        patient_sally_client: AsyncClient,
+        doc_jdoe: User,
+        sally_has_jdoe: PatientDoctor,
     ):
         """Test that authenticated users can view their selected doctors."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
-        )
-
-        assert sign_in_response.status_code == status.HTTP_200_OK
-
-        token = Token(**sign_in_response.json()).data.access_token
-
-        # assign doctor to patient
-        response: Response = await api_client.post(
-            "/api/v1/me/doctors",
-            json={"doctor_ids": [str(doc_jdoe.id)]},
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        assert response.status_code == status.HTTP_201_CREATED
-
-        assigned_doctors_response: Response = await api_client.get(
-            "/api/v1/me/doctors", headers={"Authorization": f"Bearer {token}"}
+        assigned_doctors_response: Response = await patient_sally_client.get(
+            "/api/v1/me/doctors"
         )
 
         assert assigned_doctors_response.status_code == status.HTTP_200_OK
@@ -348,6 +283,7 @@ class TestAssignedDoctorsListingEndpoint:
         doctors = PatientDoctorRead(**assigned_doctors_response.json()).data.doctors
 
         assert doc_jdoe.id == doctors[0].doctor_id
+        assert doctors[0].doctor_name == doc_jdoe.name
 
 
 @pytest.mark.anyio
@@ -357,81 +293,139 @@ class TestDoctorPatientsListingEndpoint:
     This endpoint is only accessible to doctors.
     """
 
-    async def test_listing_with_unauthenticated_user(self, api_client: AsyncClient):
-        """Test that unauthenticated users are not granted access."""
-        response: Response = await api_client.get("/api/v1/me/patients")
-
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
-
-    async def test_forbidden_for_patient_users(
-        self, api_client: AsyncClient, patient_sally: User
+    async def test_doctor_can_list_patients(
+        self,
+        doc_jdoe_client: AsyncClient,
+        patient_sally: User,
+        sally_has_jdoe: PatientDoctor,
     ):
-        """Tests that this endpoint is only accessible to doctors."""
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
+        """Test that authenticated doctors can view their patients."""
+        # verify that the patient who selected the doctor is listed
+        assigned_patients_response: Response = await doc_jdoe_client.get(
+            "/api/v1/me/patients"
         )
 
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        assert assigned_patients_response.status_code == status.HTTP_200_OK
 
-        token = Token(**sign_in_response.json()).data.access_token
+        # verify that the patient is in the doctors list of patients
+        patients = DoctorPatientRead(**assigned_patients_response.json()).data.patients
 
-        response: Response = await api_client.get(
-            "/api/v1/me/patients",
-            headers={"Authorization": f"Bearer {token}"},
-        )
+        assert patients[0].patient_id == patient_sally.id
+        assert patients[0].patient_name == patient_sally.name
 
-        expected_error_msg = (
-            "You are unauthorized to perform this action. "
-            "Only doctors can perform this action."
-        )
 
-        assert response.status_code == status.HTTP_403_FORBIDDEN
-        assert response.json().get("detail").get("error") == expected_error_msg
+@pytest.mark.anyio
+class TestDoctorsListingEndpoint:
+    """Tests the GET /api/v1/doctors endpoint.
 
-    async def test_doctor_can_list_patients(
+    The rendered list is cached, in Redis and in the process, until a doctor
+    signs up, changes or leaves.
+    """
+
+    async def test_doctors_are_listed(
+        self, patient_sally_client: AsyncClient, doc_jdoe: User
+    ):
+        """Test that every doctor is listed with their ID and name."""
+        response: Response = await patient_sally_client.get("/api/v1/doctors")
+
+        assert response.status_code == status.HTTP_200_OK
+
+        doctors = Doctors(**response.json())
+
+        assert doctors.message == "Doctors retrieved successfully"
+        assert doctors.count == 1
+        assert doctors.data[0].id == doc_jdoe.id
+        assert doctors.data[0].name == doc_jdoe.name
+
+    async def test_doctors_are_served_from_the_cache(
         self,
-        api_client: AsyncClient,
-        patient_sally: User,
+        patient_sally_client: AsyncClient,
         doc_jdoe: User,
+        password_hash: str,
+        session,
+        redis,
     ):
-        """Test that authenticated doctors can view their patients."""
-        # sign in as patient and select the doctor
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": patient_sally.email, "password": "password1234"},
+        """Test that a repeated request is answered from the cache, first in
+        the process and then in Redis."""
+        response: Response = await patient_sally_client.get("/api/v1/doctors")
+        assert response.status_code == status.HTTP_200_OK
+
+        assert redis.store[cache.DOCTORS_KEY] == response.content
+        assert cache.local_doctors[cache.DOCTORS_KEY] == response.content
+
+        # a doctor added behind the API's back does not invalidate the cache
+        session.add(
+            User(
+                name="Jane Roe",
+                email="jroe@email.com",
+                role="Doctor",
+                password_hash=password_hash,
+            )
         )
+        await session.flush()
 
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        cached_response = await patient_sally_client.get("/api/v1/doctors")
+        assert cached_response.content == response.content
 
-        token = Token(**sign_in_response.json()).data.access_token
+        cache.local_doctors.clear()
+        cached_response = await patient_sally_client.get("/api/v1/doctors")
+        assert cached_response.content == response.content
 
-        # assign doctor to patient
-        response: Response = await api_client.post(
-            "/api/v1/me/doctors",
-            json={"doctor_ids": [str(doc_jdoe.id)]},
-            headers={"Authorization": f"Bearer {token}"},
-        )
-
-        assert response.status_code == status.HTTP_201_CREATED
+    async def test_doctor_signup_invalidates_the_cache(
+        self, patient_sally_client: AsyncClient, doc_jdoe: User, redis
+    ):
+        """Test that a new doctor is listed right after signing up."""
+        response: Response = await patient_sally_client.get("/api/v1/doctors")
+        assert Doctors(**response.json()).count == 1
 
-        # now sign in as the doctor and verify the patient has selected you
-        sign_in_response: Response = await api_client.post(
-            "/api/v1/auth/login",
-            data={"username": doc_jdoe.email, "password": "password1234"},
+        response = await patient_sally_client.post(
+            "/api/v1/auth/signup",
+            json={
+                "name": "Jane Roe",
+                "email": "jroe@email.com",
+                "password": "password1234",
+                "role": "Doctor",
+            },
         )
+        assert response.status_code == status.HTTP_201_CREATED
 
-        assert sign_in_response.status_code == status.HTTP_200_OK
+        assert cache.DOCTORS_KEY not in redis.store
+        assert cache.DOCTORS_KEY not in cache.local_doctors
 
-        token = Token(**sign_in_response.json()).data.access_token
+        response = await patient_sally_client.get("/api/v1/doctors")
+        assert Doctors(**response.json()).count == 2
 
-        assigned_patients_response: Response = await api_client.get(
-            "/api/v1/me/patients", headers={"Authorization": f"Bearer {token}"}
+    async def test_doctor_update_invalidates_the_cache(
+        self, patient_sally_client: AsyncClient, doc_jdoe: User, session, redis
+    ):
+        """Test that a doctor's new name is listed right after the update."""
+        response: Response = await patient_sally_client.get("/api/v1/doctors")
+        assert Doctors(**response.json()).data[0].name == doc_jdoe.name
+
+        await crud_user.update(
+            db=session,
+            schema=UserSchema.model_construct(name="Jonathan Doe"),
+            obj_id=doc_jdoe.id,
+            obj_owner_id=doc_jdoe.id,
+            redis=redis,
         )
 
-        assert assigned_patients_response.status_code == status.HTTP_200_OK
+        response = await patient_sally_client.get("/api/v1/doctors")
+        assert Doctors(**response.json()).data[0].name == "Jonathan Doe"
 
-        # verify that the patient is in the doctors list of patients
-        patients = DoctorPatientRead(**assigned_patients_response.json()).data.patients
+    async def test_doctor_deletion_invalidates_the_cache(
+        self, patient_sally_client: AsyncClient, doc_jdoe: User, session, redis
+    ):
+        """Test that a deleted doctor is no longer listed."""
+        response: Response = await patient_sally_client.get("/api/v1/doctors")
+        assert Doctors(**response.json()).count == 1
+
+        await crud_user.delete(
+            db=session,
+            obj_id=doc_jdoe.id,
+            obj_owner_id=doc_jdoe.id,
+            redis=redis,
+        )
 
-        assert patients[0].patient_id == patient_sally.id
+        response = await patient_sally_client.get("/api/v1/doctors")
+        assert Doctors(**response.json()).count == 0
@@ -8,20 +8,20 @@ from httpx import AsyncClient, Response
 
 
 @pytest.mark.anyio
-async def test_root_endpoint(api_client: AsyncClient):
-    """Test that the root endpoint is working and returns the right message."""
-    response: Response = await api_client.get("/")
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/", {"message": "Hello, welcome to the Hospital Backend System"}),
+        ("/status", {"status": "OK"}),
+    ],
+    ids=["root", "status"],
+)
+async def test_endpoint_is_up(
+    api_client: AsyncClient, path: str, expected: dict
+):
+    """Test that the root and status endpoints are working and return the
+    right message."""
+    response: Response = await api_client.get(path)
 
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == {
-        "message": "Hello, welcome to the Hospital Backend System"
-    }
-
-
-@pytest.mark.anyio
-async def test_status_endpoint(api_client: AsyncClient):
-    """Test that the status endpoint is up and running."""
-    response = await api_client.get("/status")
-
-    assert response.status_code == status.HTTP_200_OK
-    assert response.json() == {"status": "OK"}
+    assert response.json() == expected